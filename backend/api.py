@@ -1,43 +1,40 @@
-from flask import Flask, request, jsonify, make_response
+from flask import Flask, request, jsonify, make_response, Response, stream_with_context
 from server import (
     addRecipe, getRecipe, updateRecipe, deleteRecipe, 
-    searchRecipe, getRecipes, DatabaseError,
-    check_db_consistency, fix_database_consistency
+    searchRecipe, getRecipes, getRecipesPage, getRecipesByIds, iterRecipes, DatabaseError,
+    check_db_consistency, fix_database_consistency, get_pool_stats, get_query_stats,
+    get_db_health, ensure_recipe_indexes, check_recipe_indexes, get_cache_stats
 )
 import json
 import logging
-import os
 from flask_cors import CORS
 from functools import wraps
 import traceback
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
-
-# Configure logging
-log_level = os.getenv('LOG_LEVEL', 'info').upper()
-log_file = os.getenv('LOG_FILE_PATH', 'api.log')
-log_format = os.getenv('LOG_FORMAT', '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-
-# Create logs directory if it doesn't exist
-os.makedirs(os.path.dirname(log_file), exist_ok=True)
-
-logging.basicConfig(
-    level=getattr(logging, log_level, logging.INFO),
-    format=log_format,
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler(log_file)
-    ]
-)
+from settings import get_settings
+from logging_config import configure_logging
+from pagination import PaginationError, parse_limit, parse_sort, decode_cursor
+from projection import ProjectionError, parse_projection
+from query_compiler import QueryError, compile_search, plan_cache_info
+from etags import content_etag, version_etag, matching_etag
+from compression import compress_response, SUPPORTED_ENCODINGS
+from json_provider import FastJSONProvider
+from shared_cache import shared_cache, recipe_namespace, LIST_NAMESPACE
+from singleflight import flight_key
+from metrics import instrument_app, metrics_response
+from streaming import wants_stream, wants_ndjson, stream_json_array, stream_ndjson, NDJSON_MIMETYPE
+
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Initialize Flask app
 app = Flask(__name__)
+# Encode responses and decode request bodies through the fast JSON path
+app.json = FastJSONProvider(app)
+# Registered first so the recorded latency includes the other request hooks
+instrument_app(app)
 
 # Configure CORS properly for production
-allowed_origins = os.getenv('CORS_ALLOWED_ORIGINS', '*')
+allowed_origins = get_settings().cors_allowed_origins
 if allowed_origins != '*':
     # Parse comma-separated origins into a list
     origins = [origin.strip() for origin in allowed_origins.split(',')]
@@ -60,9 +57,14 @@ else:
 # Request logging middleware
 @app.before_request
 def log_request_info():
-    logger.info(f"Request: {request.method} {request.path} from {request.remote_addr}")
-    if request.method in ['POST', 'PUT'] and request.is_json:
-        logger.debug(f"Request payload: {request.json}")
+    # Lazy arguments: lines dropped by the level or by sampling are never formatted
+    logger.info("Request: %s %s from %s", request.method, request.path, request.remote_addr)
+    if request.method in ['POST', 'PUT'] and request.is_json and logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Request payload: %s", request.json)
+
+def is_object_id(id):
+    """Check that an ID is a 24 character hex string."""
+    return isinstance(id, str) and len(id) == 24 and all(c in '0123456789abcdefABCDEF' for c in id)
 
 # Error handling decorator
 def handle_exceptions(f):
@@ -70,6 +72,8 @@ def handle_exceptions(f):
     def decorated_function(*args, **kwargs):
         try:
             return f(*args, **kwargs)
+        except (ProjectionError, QueryError) as e:
+            return jsonify({"error": "Bad request", "message": str(e)}), 400
         except DatabaseError as e:
             logger.error(f"Database error: {str(e)}")
             return jsonify({"error": "Database error", "message": str(e)}), 500
@@ -79,6 +83,62 @@ def handle_exceptions(f):
             return jsonify({"error": "Server error", "message": "An unexpected error occurred"}), 500
     return decorated_function
 
+def request_projection():
+    """Build the MongoDB projection from the fields/exclude query parameters."""
+    return parse_projection(request.args.get('fields'), request.args.get('exclude'))
+
+def streamed_recipes(search=None, projection=None):
+    """Stream matching recipes as a JSON array or NDJSON, per the request."""
+    recipes = iterRecipes(search, projection=projection)
+    if wants_ndjson(request):
+        return Response(stream_with_context(stream_ndjson(recipes)), mimetype=NDJSON_MIMETYPE)
+    return Response(stream_with_context(stream_json_array(recipes)), mimetype='application/json')
+
+def conditional_response(response, etag=None):
+    """Attach a strong ETag and answer a matching If-None-Match with 304."""
+    etag = etag or content_etag(response.get_data())
+    matched = matching_etag(request.if_none_match, etag, SUPPORTED_ENCODINGS)
+    if matched:
+        return not_modified(matched)
+    response.set_etag(etag)
+    return response
+
+def shared_json_response(key, namespace, load, etag_for=None):
+    """Serve a JSON payload through the cross-worker cache when it is enabled.
+
+    `load` returns the payload, or None when there is nothing to serve (in
+    which case None is returned). `etag_for` can derive the ETag from the
+    payload so a revalidation is answered without serializing it.
+    """
+    if shared_cache.enabled:
+        cached = shared_cache.get(key)
+        if cached is not None:
+            body, etag = cached
+            return conditional_response(app.response_class(body, mimetype='application/json'), etag)
+        # Read before loading, so a write landing during the load makes the
+        # entry stale; None means the cache is unreadable and nothing is stored
+        generation = shared_cache.generation(namespace)
+
+    payload = load()
+    if payload is None:
+        return None
+    etag = etag_for(payload) if etag_for else None
+    matched = matching_etag(request.if_none_match, etag, SUPPORTED_ENCODINGS) if etag else None
+    if matched:
+        return not_modified(matched)
+
+    response = jsonify(payload)
+    etag = etag or content_etag(response.get_data())
+    if shared_cache.enabled and generation is not None:
+        shared_cache.set(key, namespace, generation, response.get_data(), etag)
+    return conditional_response(response, etag)
+
+def not_modified(etag):
+    """Build a 304 response for an ETag the client already holds."""
+    response = make_response('', 304)
+    response.set_etag(etag)
+    return response
+
 # API Routes
 @app.route('/api/<id>', methods=['PUT'])
 @handle_exceptions
@@ -97,15 +157,22 @@ def apiSearch():
     if not data:
         return jsonify({"error": "Bad request", "message": "No search criteria provided"}), 400
     
-    recipes = searchRecipe(data)
+    search = compile_search(data)
+    projection = request_projection()
+    if wants_stream(request):
+        return streamed_recipes(search, projection)
+    recipes = searchRecipe(search, projection)
     return jsonify(recipes), 200
 
 @app.route('/api/search/<search_str>', methods=['GET'])
 @handle_exceptions
 def apiSearchGet(search_str):
     try:
-        search_dict = json.loads(search_str)
-        recipes = searchRecipe(search_dict)
+        search = compile_search(json.loads(search_str))
+        projection = request_projection()
+        if wants_stream(request):
+            return streamed_recipes(search, projection)
+        recipes = searchRecipe(search, projection)
         return jsonify(recipes), 200
     except json.JSONDecodeError:
         return jsonify({"error": "Bad request", "message": "Invalid JSON in search parameter"}), 400
@@ -143,10 +210,12 @@ def apiPOST():
 def health_check():
     """Health check endpoint for monitoring and load balancers."""
     try:
-        # We could add more complex health checks here if needed
+        # Report the cached monitor state; this never queries the database
+        database = get_db_health()
         return jsonify({
-            "status": "healthy",
-            "service": "recipe-api"
+            "status": "healthy" if database["status"] != "down" else "degraded",
+            "service": "recipe-api",
+            "database": database
         }), 200
     except Exception as e:
         logger.error(f"Health check failed: {str(e)}")
@@ -166,7 +235,8 @@ def db_health_check():
         
         return jsonify({
             "status": "healthy",
-            "db_check": result
+            "db_check": result,
+            "query_plan_cache": plan_cache_info()
         }), 200
     except Exception as e:
         logger.error(f"Database health check failed: {str(e)}")
@@ -175,6 +245,43 @@ def db_health_check():
             "message": str(e)
         }), 500
 
+@app.route('/api/db-pool', methods=['GET'])
+@handle_exceptions
+def db_pool_stats():
+    """Report connection pool statistics for this worker."""
+    return jsonify(get_pool_stats()), 200
+
+@app.route('/api/db-queries', methods=['GET'])
+@handle_exceptions
+def db_query_stats():
+    """Report the costliest query shapes and recent slow queries for this worker."""
+    return jsonify(get_query_stats()), 200
+
+@app.route('/api/db-indexes', methods=['GET'])
+@handle_exceptions
+def db_indexes():
+    """Report drift between declared and actual recipe indexes."""
+    return jsonify(check_recipe_indexes()), 200
+
+@app.route('/api/db-indexes', methods=['POST'])
+@handle_exceptions
+def db_indexes_apply():
+    """Create any missing recipe indexes."""
+    return jsonify(ensure_recipe_indexes()), 200
+
+@app.route('/api/cache-stats', methods=['GET'])
+def cache_stats():
+    """Report recipe cache statistics for this worker."""
+    return jsonify(get_cache_stats()), 200
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Expose request and data function metrics of all workers to Prometheus."""
+    response = metrics_response()
+    if response is None:
+        return jsonify({"error": "Not available", "message": "Metrics are disabled on this server"}), 404
+    return response
+
 @app.route('/api/db-fix', methods=['POST'])
 @handle_exceptions
 def fix_database():
@@ -198,21 +305,22 @@ def fix_database():
 def apiGET(id):
     """Get a recipe by ID."""
     # Skip invalid IDs early to avoid wasting resources
-    if len(id) != 24 or not all(c in '0123456789abcdefABCDEF' for c in id):
+    if not is_object_id(id):
         logger.warning(f"Invalid ObjectId format: {id}")
         return jsonify({
             "error": "Invalid ID format",
             "message": f"The ID {id} is not in a valid format"
         }), 400
     
-    logger.info(f"GET request received for recipe ID: {id}")
+    logger.info("GET request received for recipe ID: %s", id)
     
     try:
-        recipe = getRecipe(id)
+        # The write timestamp is enough to answer 304 without serializing
+        response = shared_json_response(f"recipe:{id.lower()}", recipe_namespace(id),
+                                        lambda: getRecipe(id), version_etag)
         
-        if recipe:
-            logger.info(f"Recipe found, returning 200 OK")
-            return jsonify(recipe), 200
+        if response is not None:
+            return response
         else:
             logger.warning(f"Recipe with ID {id} not found")
             return jsonify({
@@ -234,12 +342,56 @@ def apiGET(id):
                 "message": f"Error retrieving recipe: {str(e)}"
             }), 500
     
+@app.route('/api/recipes/batch', methods=['POST'])
+@handle_exceptions
+def getRecipesBatch():
+    """Get many recipes by ID in one request."""
+    data = request.get_json(silent=True)
+    ids = data.get('ids') if isinstance(data, dict) else None
+    if not isinstance(ids, list) or not ids:
+        return jsonify({"error": "Bad request", "message": "Provide a non-empty 'ids' list"}), 400
+    # Maximum number of IDs accepted by the batch endpoint
+    batch_max = get_settings().recipes_batch_max
+    if len(ids) > batch_max:
+        return jsonify({
+            "error": "Bad request",
+            "message": f"At most {batch_max} IDs can be fetched at once"
+        }), 400
+
+    invalid = [id for id in ids if not is_object_id(id)]
+    if invalid:
+        return jsonify({
+            "error": "Invalid ID format",
+            "message": "Some IDs are not in a valid format",
+            "invalid": invalid
+        }), 400
+
+    result = getRecipesByIds(ids, request_projection())
+    return jsonify(result), 200
+
 @app.route('/api/recipes', methods=['GET'])
 @app.route('/api/', methods=['GET'])  # Keep the original endpoint for backward compatibility
 @handle_exceptions
 def getAllRecipes():
-    recipes = getRecipes()
-    return jsonify(recipes), 200
+    projection = request_projection()
+    if wants_stream(request):
+        return streamed_recipes(projection=projection)
+
+    # Without pagination parameters keep returning the full list as before
+    if not any(arg in request.args for arg in ('limit', 'after', 'sort')):
+        return shared_json_response(flight_key('recipes', projection), LIST_NAMESPACE,
+                                    lambda: getRecipes(projection))
+
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        sort_key = parse_sort(request.args.get('sort'))
+        after = request.args.get('after')
+        position = decode_cursor(after, sort_key) if after else None
+    except PaginationError as e:
+        return jsonify({"error": "Bad request", "message": str(e)}), 400
+
+    return shared_json_response(flight_key('page', limit, sort_key, after, projection), LIST_NAMESPACE,
+                                lambda: getRecipesPage(limit, position, sort_key, projection))
 
 # Error handlers
 @app.errorhandler(404)
@@ -257,8 +409,9 @@ def internal_error(error):
 # Consistent response format
 @app.after_request
 def add_header(response):
-    # Ensure JSON content type for all API responses
-    response.headers['Content-Type'] = 'application/json'
+    # Ensure JSON content type for all API responses (NDJSON streams and metrics keep theirs)
+    if response.mimetype not in (NDJSON_MIMETYPE, 'text/plain'):
+        response.headers['Content-Type'] = 'application/json'
     response.headers['X-Content-Type-Options'] = 'nosniff'
     
     # Add additional security headers
@@ -266,10 +419,15 @@ def add_header(response):
     response.headers['X-XSS-Protection'] = '1; mode=block'
     
     # Log response for debugging
-    logger.debug(f"Response: {response.status_code} {response.status}")
+    logger.debug("Response: %s %s", response.status_code, response.status)
     
     return response
 
+# Compress large bodies according to Accept-Encoding
+@app.after_request
+def compress(response):
+    return compress_response(request, response)
+
 # Handle CORS preflight requests  
 @app.route('/api/<path:path>', methods=['OPTIONS'])
 def handle_preflight(path):
@@ -0,0 +1,89 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List
+
+class _Batch:
+    """Keys collected during one batching window and their results."""
+
+    __slots__ = ('keys', 'results', 'error', 'done', 'dispatched')
+
+    def __init__(self):
+        self.keys: Dict[Hashable, None] = {}
+        self.results: Dict[Hashable, Any] = {}
+        self.error = None
+        self.done = threading.Event()
+        self.dispatched = False
+
+class BatchLoader:
+    """DataLoader-style micro-batching of concurrent single-key lookups.
+
+    The first caller of a window waits `window_ms` for other callers to add
+    their keys, then runs one `load_many` call for the whole batch and fans
+    the results back out. A batch reaching `max_keys` is dispatched at once.
+    Under gevent the waits yield to other greenlets.
+    """
+
+    def __init__(self, load_many: Callable[[List[Hashable]], Dict[Hashable, Any]],
+                 window_ms: float = 2.0, max_keys: int = 50):
+        self.load_many = load_many
+        self.window = window_ms / 1000.0
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._batch = _Batch()
+        self.batches = 0
+        self.keys_loaded = 0
+        self.loads = 0
+
+    def load(self, key: Hashable) -> Any:
+        """Return the value for key, or None if load_many did not find it."""
+        with self._lock:
+            self.loads += 1
+            batch = self._batch
+            opener = not batch.keys
+            batch.keys[key] = None
+            full = len(batch.keys) >= self.max_keys
+            if full:
+                self._take(batch)
+
+        if full:
+            self._dispatch(batch)
+        elif opener:
+            time.sleep(self.window)
+            with self._lock:
+                mine = not batch.dispatched
+                if mine:
+                    self._take(batch)
+            if mine:
+                self._dispatch(batch)
+
+        batch.done.wait()
+        if batch.error is not None:
+            raise batch.error
+        return batch.results.get(key)
+
+    def _take(self, batch: _Batch):
+        """Close a batch to new keys. Must be called with the lock held."""
+        batch.dispatched = True
+        self._batch = _Batch()
+
+    def _dispatch(self, batch: _Batch):
+        try:
+            batch.results = self.load_many(list(batch.keys))
+        except Exception as e:
+            batch.error = e
+        finally:
+            with self._lock:
+                self.batches += 1
+                self.keys_loaded += len(batch.keys)
+            batch.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "loads": self.loads,
+                "batches": self.batches,
+                "keys_loaded": self.keys_loaded,
+                "average_batch_size": round(self.keys_loaded / self.batches, 2) if self.batches else None,
+                "window_ms": self.window * 1000.0,
+                "max_keys": self.max_keys
+            }
@@ -0,0 +1,106 @@
+"""Compare per-request getRecipe lookups with BatchLoader micro-batching under gevent.
+
+By default MongoDB is simulated: each query holds one of --pool connections
+for --rtt-ms plus --per-doc-us per returned document, which models round trips
+and pool contention. Pass --uri to run the same load against a real server.
+
+Usage: python benchmarks/bench_batch_loader.py [--requests 2000] [--concurrency 200] [--uri mongodb://...]
+"""
+from gevent import monkey
+monkey.patch_all()
+
+import argparse  # noqa: E402
+import os  # noqa: E402
+import random  # noqa: E402
+import sys  # noqa: E402
+import time  # noqa: E402
+
+import gevent  # noqa: E402
+from gevent.lock import BoundedSemaphore  # noqa: E402
+from gevent.pool import Pool  # noqa: E402
+from bson.objectid import ObjectId  # noqa: E402
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_loader import BatchLoader  # noqa: E402
+
+def simulated_backend(ids, pool_size, rtt_ms, per_doc_us):
+    connections = BoundedSemaphore(pool_size)
+    documents = {id: {"_id": id, "title": f"Recipe {n}"} for n, id in enumerate(ids)}
+
+    def query(keys):
+        with connections:
+            gevent.sleep(rtt_ms / 1000.0 + per_doc_us * len(keys) / 1e6)
+        return {key: documents[key] for key in keys if key in documents}
+
+    return (lambda key: query([key]).get(key)), query
+
+def mongo_backend(uri, count, pool_size):
+    from pymongo import MongoClient
+    collection = MongoClient(uri, maxPoolSize=pool_size)["bench_batch_loader"]["recipes"]
+    collection.drop()
+    result = collection.insert_many([{"title": f"Recipe {n}"} for n in range(count)])
+    ids = [str(id) for id in result.inserted_ids]
+
+    def find_one(key):
+        return collection.find_one({"_id": ObjectId(key)})
+
+    def find_many(keys):
+        return {str(doc["_id"]): doc for doc in collection.find({"_id": {"$in": [ObjectId(k) for k in keys]}})}
+
+    return ids, find_one, find_many, collection
+
+def run(lookup, keys, concurrency):
+    latencies = []
+
+    def one(key):
+        start = time.perf_counter()
+        lookup(key)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    pool = Pool(concurrency)
+    for key in keys:
+        pool.spawn(one, key)
+    pool.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000  # noqa: E731
+    return pick(0.5), pick(0.99), len(keys) / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--recipes', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--pool', type=int, default=10, help="connection pool size")
+    parser.add_argument('--rtt-ms', type=float, default=1.0)
+    parser.add_argument('--per-doc-us', type=float, default=20.0)
+    parser.add_argument('--window-ms', type=float, default=2.0)
+    parser.add_argument('--max-keys', type=int, default=50)
+    parser.add_argument('--uri', help="benchmark against this MongoDB instead of the simulation")
+    args = parser.parse_args()
+
+    collection = None
+    if args.uri:
+        ids, find_one, find_many, collection = mongo_backend(args.uri, args.recipes, args.pool)
+        mode = "mongodb"
+    else:
+        ids = [str(ObjectId()) for _ in range(args.recipes)]
+        find_one, find_many = simulated_backend(ids, args.pool, args.rtt_ms, args.per_doc_us)
+        mode = f"simulated (rtt {args.rtt_ms} ms, {args.per_doc_us} us/doc)"
+
+    keys = [random.choice(ids) for _ in range(args.requests)]
+    loader = BatchLoader(find_many, window_ms=args.window_ms, max_keys=args.max_keys)
+
+    print(f"{mode}: {args.requests} lookups, {args.concurrency} concurrent greenlets, pool {args.pool}")
+    for label, lookup in (("per-request", find_one), ("batched", loader.load)):
+        p50, p99, throughput = run(lookup, keys, args.concurrency)
+        print(f"{label:>12}: p50 {p50:7.2f} ms  p99 {p99:7.2f} ms  {throughput:8.0f} lookups/s")
+    print(f"batches: {loader.stats()}")
+
+    if collection is not None:
+        collection.drop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Compare the stdlib Flask JSON provider with FastJSONProvider on recipe documents.
+
+Usage: python benchmarks/bench_json_provider.py [--recipes 500] [--repeat 20]
+"""
+import argparse
+import copy
+import json
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+from bson.objectid import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from json_provider import FastJSONProvider, orjson  # noqa: E402
+
+SAMPLE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'recipeEx.json')
+
+def build_recipes(count: int):
+    """Build realistic recipe documents as pymongo would return them."""
+    with open(SAMPLE_PATH) as file:
+        sample = json.load(file)
+    now = datetime(2024, 1, 1)
+    recipes = []
+    for i in range(count):
+        recipe = copy.deepcopy(sample)
+        recipe['_id'] = ObjectId()
+        recipe['recipeName'] = f"{sample['recipeName']} {i}"
+        recipe['updatedAt'] = now + timedelta(minutes=i)
+        recipe['ingredients'] = sample['ingredients'] * 4
+        recipe['steps'] = [f"Step {n}: stir and simmer for a while" for n in range(8)]
+        recipes.append(recipe)
+    return recipes
+
+def format_recipe(recipe):
+    """The per-document pass the stdlib path needs before encoding."""
+    recipe = dict(recipe)
+    recipe['_id'] = str(recipe['_id'])
+    recipe['updatedAt'] = recipe['updatedAt'].isoformat() + 'Z'
+    return recipe
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--recipes', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    stdlib = DefaultJSONProvider(app)
+    fast = FastJSONProvider(app)
+    recipes = build_recipes(args.recipes)
+
+    def encode_stdlib():
+        return stdlib.dumps([format_recipe(recipe) for recipe in recipes])
+
+    def encode_fast():
+        return fast.dumps(recipes)
+
+    body = encode_stdlib().encode('utf-8')
+
+    def decode_stdlib():
+        return stdlib.loads(body)
+
+    def decode_fast():
+        return fast.loads(body)
+
+    print(f"orjson available: {orjson is not None}")
+    print(f"{args.recipes} recipes, {len(body) / 1024:.1f} KiB of JSON, best of {args.repeat} runs")
+    for label, baseline, candidate in (("encode", encode_stdlib, encode_fast), ("decode", decode_stdlib, decode_fast)):
+        base = min(timeit.repeat(baseline, number=1, repeat=args.repeat))
+        new = min(timeit.repeat(candidate, number=1, repeat=args.repeat))
+        print(f"{label}: stdlib {base * 1000:8.2f} ms  fast {new * 1000:8.2f} ms  "
+              f"({base / new:.1f}x, {base / args.recipes * 1e6:.1f} -> {new / args.recipes * 1e6:.1f} us/recipe)")
+
+if __name__ == '__main__':
+    main()
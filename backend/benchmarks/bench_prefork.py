@@ -0,0 +1,84 @@
+"""Compare per-worker memory of the Gunicorn server with and without pre-fork warmup.
+
+Starts main.py twice (PREFORK_WARMUP=false, then true), sends a few requests
+to every worker and reads /proc/<pid>/smaps_rollup (Linux only). Point it at
+a populated database with MONGO_URI and set MIRROR_ENABLED=true to include
+the recipe snapshot.
+
+Usage: python benchmarks/bench_prefork.py [--workers 3] [--port 6189] [--requests 50]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+def memory(pid):
+    usage = {}
+    with open(f'/proc/{pid}/smaps_rollup') as file:
+        for line in file:
+            key, _, value = line.partition(':')
+            if key in FIELDS:
+                usage[key] = int(value.split()[0])
+    return usage
+
+def children(pid):
+    with open(f'/proc/{pid}/task/{pid}/children') as file:
+        return [int(child) for child in file.read().split()]
+
+def wait_for_workers(pid, workers, port, timeout=60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if len(children(pid)) >= workers:
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{port}/api/health', timeout=5).read()
+                return
+            except urllib.error.HTTPError:
+                # A degraded health check still proves the workers are serving
+                return
+            except OSError:
+                pass
+        time.sleep(0.5)
+    raise RuntimeError("Workers did not start in time")
+
+def run(warmup, args):
+    env = dict(os.environ, PREFORK_WARMUP='true' if warmup else 'false', WORKERS=str(args.workers),
+               PORT=str(args.port), HOST='127.0.0.1', FLASK_ENV='production', LOG_LEVEL='warning')
+    server = subprocess.Popen([sys.executable, 'main.py'], cwd=BACKEND_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_workers(server.pid, args.workers, args.port)
+        for path in ('/api/health', '/api/recipes') * args.requests:
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{args.port}{path}', timeout=10).read()
+            except OSError:
+                pass
+        time.sleep(1.0)
+        return memory(server.pid), [memory(pid) for pid in children(server.pid)]
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--port', type=int, default=6189)
+    parser.add_argument('--requests', type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{args.workers} workers, KiB per process")
+    for warmup in (False, True):
+        master, workers = run(warmup, args)
+        label = "warmup" if warmup else "no warmup"
+        average = {field: sum(worker[field] for worker in workers) // len(workers) for field in FIELDS}
+        print(f"{label:>10}: master rss {master['Rss']:6d}  worker rss {average['Rss']:6d}  "
+              f"pss {average['Pss']:6d}  shared {average['Shared_Clean'] + average['Shared_Dirty']:6d}  "
+              f"private {average['Private_Clean'] + average['Private_Dirty']:6d}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Compare dict and RawBSONDocument read paths from BSON wire bytes to JSON.
+
+RawBSONDocument (LAZY_BSON_DECODE) defers decoding to the JSON encoder: it
+holds far less memory per document but costs more CPU in total.
+
+Usage: python benchmarks/bench_raw_bson.py [--recipes 500] [--repeat 20]
+"""
+import argparse
+import os
+import sys
+import timeit
+import tracemalloc
+
+import bson
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from json_provider import dumps_bytes, orjson  # noqa: E402
+from bench_json_provider import build_recipes  # noqa: E402
+
+DICT_OPTIONS = CodecOptions()
+RAW_OPTIONS = CodecOptions(document_class=RawBSONDocument)
+
+def measure_memory(func):
+    """Return (peak bytes during func, bytes still held by its result)."""
+    tracemalloc.start()
+    result = func()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    dumps_bytes(result)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, retained
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--recipes', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    # The bytes pymongo receives for a batch of recipes
+    wire = b''.join(bson.encode(recipe) for recipe in build_recipes(args.recipes))
+
+    def decode_dicts():
+        return bson.decode_all(wire, DICT_OPTIONS)
+
+    def decode_raw():
+        return bson.decode_all(wire, RAW_OPTIONS)
+
+    print(f"orjson available: {orjson is not None}")
+    print(f"{args.recipes} recipes, {len(wire) / 1024:.1f} KiB of BSON, best of {args.repeat} runs")
+    results = {}
+    for label, decode in (("dict", decode_dicts), ("raw", decode_raw)):
+        decode_time = min(timeit.repeat(decode, number=1, repeat=args.repeat))
+        documents = decode()
+        encode_time = min(timeit.repeat(lambda: dumps_bytes(documents), number=1, repeat=args.repeat))
+        peak, retained = measure_memory(decode)
+        results[label] = (decode_time + encode_time, retained)
+        print(f"{label:>4}: decode {decode_time / args.recipes * 1e6:6.2f} us/doc  "
+              f"encode {encode_time / args.recipes * 1e6:6.2f} us/doc  "
+              f"held {retained / args.recipes:7.0f} B/doc  peak {peak / args.recipes:7.0f} B/doc")
+
+    (dict_cpu, dict_mem), (raw_cpu, raw_mem) = results["dict"], results["raw"]
+    print(f"raw vs dict: {(raw_cpu - dict_cpu) / args.recipes * 1e6:+.2f} us/doc CPU, "
+          f"{(raw_mem - dict_mem) / args.recipes:+.0f} B/doc held memory")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Compare memory held by pymongo dicts and compact recipe records.
+
+Records cache their encoded JSON, so the first encode of a record costs more
+than the later ones and the memory held grows once every record was served.
+
+Usage: python benchmarks/bench_records.py [--recipes 2000] [--repeat 10]
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import timeit
+import tracemalloc
+
+import bson
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from json_provider import dumps_bytes  # noqa: E402
+from records import RecipeRecord, vocabulary_sizes  # noqa: E402
+from bench_json_provider import build_recipes  # noqa: E402
+
+def measure_retained(func):
+    """Return (result, bytes still held by the result of func)."""
+    gc.collect()
+    tracemalloc.start()
+    result = func()
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, retained
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--recipes', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    # Decoding from BSON gives every document its own strings, as pymongo does
+    wire = b''.join(bson.encode(recipe) for recipe in build_recipes(args.recipes))
+
+    def load_dicts():
+        return bson.decode_all(wire)
+
+    def load_records():
+        return [RecipeRecord.from_document(doc) for doc in bson.decode_all(wire)]
+
+    print(f"{args.recipes} recipes, {len(wire) / 1024:.1f} KiB of BSON, best of {args.repeat} runs")
+    def first_encode(load):
+        documents = load()
+        start = time.perf_counter()
+        dumps_bytes(documents)
+        return time.perf_counter() - start
+
+    def load_and_encode(load):
+        documents = load()
+        dumps_bytes(documents)
+        return documents
+
+    results, served_results = {}, {}
+    for label, load in (("dict", load_dicts), ("record", load_records)):
+        documents, retained = measure_retained(load)
+        _, served = measure_retained(lambda: load_and_encode(load))
+        load_time = min(timeit.repeat(load, number=1, repeat=args.repeat))
+        first_time = min(first_encode(load) for _ in range(args.repeat))
+        encode_time = min(timeit.repeat(lambda: dumps_bytes(documents), number=1, repeat=args.repeat))
+        results[label] = retained
+        served_results[label] = served
+        print(f"{label:>6}: held {retained / args.recipes:7.0f} B/recipe "
+              f"({served / args.recipes:.0f} once served)  "
+              f"load {load_time / args.recipes * 1e6:6.2f} us/recipe  "
+              f"encode first {first_time / args.recipes * 1e6:6.2f}, "
+              f"then {encode_time / args.recipes * 1e6:6.2f} us/recipe")
+        del documents
+
+    saved = results["dict"] - results["record"]
+    saved_served = served_results["dict"] - served_results["record"]
+    print(f"record vs dict: {saved / args.recipes:+.0f} B/recipe saved "
+          f"({saved / results['dict'] * 100:.0f}%), {saved_served / args.recipes:+.0f} once served "
+          f"({saved_served / served_results['dict'] * 100:.0f}%), vocabularies {vocabulary_sizes()}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+from collections import OrderedDict
+import threading
+import time
+from typing import Any, Dict, Hashable
+from settings import Settings, get_settings, on_reload
+
+_MISSING = object()
+
+class LRUCache:
+    """Bounded, thread-safe LRU cache with a per-entry time to live.
+
+    Values are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_size: int = 512, ttl_seconds: float = 300.0, enabled: bool = True):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled and max_size > 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def configure(self, max_size: int, ttl_seconds: float, enabled: bool = True):
+        """Apply new limits, evicting entries beyond the new size."""
+        with self._lock:
+            self.max_size = max_size
+            self.ttl_seconds = ttl_seconds
+            self.enabled = enabled and max_size > 0
+            if not self.enabled:
+                self._data.clear()
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        if not self.enabled:
+            return default
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        if not self.enabled:
+            return
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds > 0 else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            if self._data.pop(key, _MISSING) is not _MISSING:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._data)
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations
+            }
+
+# Formatted recipe documents keyed by their string ID
+recipe_cache = LRUCache(
+    max_size=get_settings().recipe_cache_size,
+    ttl_seconds=get_settings().recipe_cache_ttl_seconds,
+    enabled=get_settings().recipe_cache_enabled
+)
+
+@on_reload
+def _configure_recipe_cache(old: Settings, new: Settings):
+    recipe_cache.configure(new.recipe_cache_size, new.recipe_cache_ttl_seconds, new.recipe_cache_enabled)
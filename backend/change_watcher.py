@@ -0,0 +1,365 @@
+import threading
+import time
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, IO, Optional, Set, Tuple
+from bson import json_util
+from pymongo.collection import Collection
+from pymongo.errors import OperationFailure
+from etags import UPDATED_AT_FIELD
+from shared_cache import shared_cache
+
+try:
+    import fcntl
+except ImportError:  # Windows; every process then watches on its own
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Server error codes meaning change streams cannot be used on this deployment
+CHANGE_STREAMS_UNSUPPORTED = {40573, 136}
+# The resume token is too old or otherwise unusable
+CHANGE_STREAM_HISTORY_LOST = {280, 286}
+
+TOKEN_KEY = 'change_stream_resume_token'
+WATERMARK_KEY = 'change_poll_watermark'
+# When the leading watcher last confirmed it had seen every change
+SYNCED_KEY = 'change_watcher_synced_at'
+
+# How often followers read the change log, and non-leaders try to take over
+FOLLOW_INTERVAL = 0.25
+LEADER_RETRY_INTERVAL = 1.0
+# Minimum time between two synced-at writes by the leader
+SYNC_WRITE_INTERVAL = 1.0
+# The poll compares the full _id set at least every this many polls
+ID_RESCAN_POLLS = 30
+
+class ChangeWatcher:
+    """Background watcher that invalidates caches when recipes change anywhere.
+
+    Follows a change stream on the recipe collection, so writes made by other
+    workers and other nodes reach this worker's caches. Deployments without
+    change streams (standalone mongod) are polled on updatedAt instead.
+
+    With the shared cache enabled only one process per node, the holder of a
+    lock file, reads from MongoDB. It bumps the shared generations once per
+    change and appends the change to the shared change log; every process,
+    the leader included, follows that log to update its own memory. The
+    resume position is kept in the shared cache, so whichever process takes
+    over carries on from where the node left off. Without the shared cache
+    every process watches on its own.
+    """
+
+    def __init__(self, collection: Callable[[], Collection], on_change: Callable[[str], None],
+                 on_reset: Callable[[], None], mode: str = 'auto', poll_interval: float = 2.0,
+                 poll_overlap: float = 5.0, max_await_ms: int = 1000):
+        self.collection = collection
+        self.on_change = on_change
+        self.on_reset = on_reset
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.poll_overlap = poll_overlap
+        self.max_await_ms = max_await_ms
+        self._state: Dict[str, str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._follower: Optional[threading.Thread] = None
+        self._lock_file: Optional[IO] = None
+        # Last change log entry applied in this process
+        self._position: Optional[int] = None
+        self._synced_written = 0.0
+        self.leading = False
+        self.active_mode: Optional[str] = None
+        self.events = 0
+        self.resets = 0
+        self.errors = 0
+        self.last_event_at: Optional[float] = None
+        # When the watcher last confirmed it had seen every change up to now
+        self.last_sync_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def shared(self) -> bool:
+        """Whether changes are read by one leader and shared through the change log."""
+        return shared_cache.enabled
+
+    def start(self):
+        """Start watching in this process; safe to call more than once."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        if self.shared:
+            if self._position is None:
+                self._position = shared_cache.change_position()
+            self._follower = threading.Thread(target=self._follow, name='recipe-change-follower', daemon=True)
+            self._follower.start()
+        self._thread = threading.Thread(target=self._run, name='recipe-change-watcher', daemon=True)
+        self._thread.start()
+        logger.info(f"Change watcher started in {self.mode} mode")
+
+    def prime(self):
+        """Record the current position, so a watcher started later sees every change from now on.
+
+        Used before taking a snapshot of the collection in the master process.
+        The position stays in this process and is inherited by forked workers,
+        which replay the change log from it whatever the node has read since.
+        """
+        if not self.shared:
+            self._save_source_position()
+            return
+        if self._try_lead():
+            try:
+                # Nobody is reading changes: start the node from now, and drop
+                # payloads cached before, which nothing has kept current
+                self._save_source_position()
+                shared_cache.clear()
+            finally:
+                self._resign()
+        self._position = shared_cache.change_position()
+
+    def _save_source_position(self):
+        """Store the current position in MongoDB as the place to resume reading from."""
+        if self.mode != 'poll':
+            try:
+                with self.collection().watch(max_await_time_ms=1) as stream:
+                    stream.try_next()
+                    token = stream.resume_token
+                if token is not None:
+                    self._save(TOKEN_KEY, json_util.dumps(token))
+                    return
+            except (OperationFailure, NotImplementedError) as e:
+                if self.mode != 'auto':
+                    raise
+                logger.info(f"Change streams unavailable ({str(e)}), priming the {UPDATED_AT_FIELD} poll instead")
+        self._save(WATERMARK_KEY, datetime.now(timezone.utc).replace(tzinfo=None).isoformat())
+
+    def stop(self):
+        self._stop.set()
+
+    def _lock_path(self) -> str:
+        return shared_cache.path + '.watcher.lock'
+
+    def _try_lead(self) -> bool:
+        """Become the node's leading watcher if no live process holds the lock."""
+        if fcntl is None:
+            self.leading = True
+            return True
+        lock_file = open(self._lock_path(), 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        self.leading = True
+        return True
+
+    def _resign(self):
+        self.leading = False
+        if self._lock_file is not None:
+            # Closing the file releases the lock; the kernel also does so if the process dies
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _load(self, key: str) -> Optional[str]:
+        if shared_cache.enabled:
+            # A resume position read as missing would skip changes
+            return shared_cache.get_meta(key, strict=True)
+        return self._state.get(key)
+
+    def _save(self, key: str, value: Optional[str]):
+        if shared_cache.enabled:
+            shared_cache.set_meta(key, value)
+        elif value is None:
+            self._state.pop(key, None)
+        else:
+            self._state[key] = value
+
+    def _run(self):
+        try:
+            self._lead()
+        finally:
+            self._resign()
+
+    def _lead(self):
+        while self.shared and not self._stop.is_set() and not self._try_lead():
+            self._stop.wait(LEADER_RETRY_INTERVAL)
+        if self.shared:
+            logger.info("This process now reads recipe changes for the node")
+        backoff = 1.0
+        while not self._stop.is_set():
+            try:
+                if self.mode == 'poll' or self.active_mode == 'poll':
+                    self._poll()
+                else:
+                    self._watch()
+                backoff = 1.0
+            except (OperationFailure, NotImplementedError) as e:
+                code = getattr(e, 'code', None)
+                if self.mode == 'auto' and (code in CHANGE_STREAMS_UNSUPPORTED or isinstance(e, NotImplementedError)):
+                    logger.info(f"Change streams unavailable ({str(e)}), polling on {UPDATED_AT_FIELD} instead")
+                    self.active_mode = 'poll'
+                    continue
+                if code in CHANGE_STREAM_HISTORY_LOST:
+                    # Events were missed; everything cached may be stale
+                    logger.warning(f"Change stream history lost, clearing caches: {str(e)}")
+                    self._save(TOKEN_KEY, None)
+                    self._emit(None)
+                    continue
+                self._failed(e)
+            except Exception as e:
+                self._failed(e)
+
+            if not self._stop.is_set():
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    def _failed(self, error: Exception):
+        self.errors += 1
+        self.last_error = str(error)
+        logger.error(f"Change watcher error: {str(error)}")
+
+    def _watch(self):
+        token = self._load(TOKEN_KEY)
+        resume_after = json_util.loads(token) if token else None
+        with self.collection().watch(resume_after=resume_after, max_await_time_ms=self.max_await_ms) as stream:
+            self.active_mode = 'change_stream'
+            while not self._stop.is_set() and stream.alive:
+                change = stream.try_next()
+                if change is not None:
+                    self._apply(change)
+                    if change.get('operationType') == 'invalidate':
+                        # The stream is closed for good; start a fresh one
+                        self._save(TOKEN_KEY, None)
+                        return
+                if stream.resume_token is not None:
+                    current = json_util.dumps(stream.resume_token)
+                    if current != token:
+                        self._save(TOKEN_KEY, current)
+                        token = current
+                self._synced()
+
+    def _apply(self, change: Dict[str, Any]):
+        operation = change.get('operationType')
+        if operation in ('insert', 'update', 'replace', 'delete'):
+            self._emit(str(change['documentKey']['_id']))
+        elif operation in ('drop', 'rename', 'dropDatabase', 'invalidate'):
+            self._emit(None)
+
+    def _emit(self, id: Optional[str]):
+        """Pass on a change read from MongoDB; None means everything may have changed."""
+        if self.shared:
+            shared_cache.publish_change(id)
+        else:
+            self._deliver(id)
+
+    def _deliver(self, id: Optional[str]):
+        self.events += 1
+        self.last_event_at = time.time()
+        if id is None:
+            self._reset()
+        else:
+            self.on_change(id)
+
+    def _reset(self):
+        self.resets += 1
+        self.on_reset()
+
+    def _synced(self):
+        """Record that every change up to now has been passed on."""
+        now = time.time()
+        if not self.shared:
+            self.last_sync_at = now
+        elif now - self._synced_written >= SYNC_WRITE_INTERVAL:
+            shared_cache.set_meta(SYNCED_KEY, repr(now))
+            self._synced_written = now
+
+    def _follow(self):
+        while not self._stop.is_set():
+            try:
+                self._catch_up()
+            except Exception as e:
+                self._failed(e)
+            self._stop.wait(FOLLOW_INTERVAL)
+
+    def _catch_up(self):
+        """Apply the changes the leader logged since this process last looked."""
+        # Read first: every change logged before the leader wrote it is applied below
+        synced = shared_cache.get_meta(SYNCED_KEY)
+        while True:
+            changes = shared_cache.changes_since(self._position)
+            if changes is None:
+                logger.warning("Fell behind the change log, reloading everything")
+                self._position = shared_cache.change_position()
+                self._reset()
+                break
+            for seq, id in changes:
+                self._deliver(id)
+                self._position = seq
+            if len(changes) < shared_cache.CHANGE_BATCH:
+                break
+        if synced is not None:
+            self.last_sync_at = float(synced)
+
+    def _poll(self):
+        watermark = self._load(WATERMARK_KEY)
+        # pymongo returns naive UTC datetimes, so the watermark is kept naive too
+        since = datetime.fromisoformat(watermark) if watermark else datetime.now(timezone.utc).replace(tzinfo=None)
+        seen: Set[Tuple[str, datetime]] = set()
+        ids = self._ids(self.collection())
+        polls = 0
+        while not self._stop.is_set():
+            collection = self.collection()
+            # Re-scan an overlap window: updatedAt comes from the writer's clock
+            query = {UPDATED_AT_FIELD: {"$gte": since - timedelta(seconds=self.poll_overlap)}}
+            current_seen = set()
+            latest = since
+            for doc in collection.find(query, {UPDATED_AT_FIELD: 1}):
+                key = (str(doc['_id']), doc[UPDATED_AT_FIELD])
+                current_seen.add(key)
+                ids.add(key[0])
+                if key not in seen:
+                    self._emit(key[0])
+                latest = max(latest, doc[UPDATED_AT_FIELD])
+            seen = current_seen
+            if latest != since:
+                since = latest
+                self._save(WATERMARK_KEY, since.isoformat())
+
+            # Deletes leave no updatedAt behind. They show up as a count below
+            # the known IDs, and the periodic full comparison catches the rest
+            polls += 1
+            if collection.estimated_document_count() != len(ids) or polls % ID_RESCAN_POLLS == 0:
+                current = self._ids(collection)
+                # Documents written without updatedAt are only found here
+                for id in ids.symmetric_difference(current):
+                    self._emit(id)
+                ids = current
+            self.active_mode = 'poll'
+            self._synced()
+            self._stop.wait(self.poll_interval)
+
+    def _ids(self, collection: Collection) -> Set[str]:
+        """Every document ID, read from the _id index alone."""
+        return {str(doc['_id']) for doc in collection.find({}, {'_id': 1})}
+
+    def lag(self) -> Optional[float]:
+        """Seconds since this process was last known to have applied every change."""
+        applier = self._follower if self.shared else self._thread
+        if self.last_sync_at is None or not (applier is not None and applier.is_alive()):
+            return None
+        return time.time() - self.last_sync_at
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "role": ('leader' if self.leading else 'follower') if self.shared else 'local',
+            "position": self._position,
+            "mode": self.active_mode or self.mode,
+            "events": self.events,
+            "resets": self.resets,
+            "errors": self.errors,
+            "last_event_at": self.last_event_at,
+            "last_sync_at": self.last_sync_at,
+            "last_error": self.last_error
+        }
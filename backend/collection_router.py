@@ -0,0 +1,130 @@
+from pymongo.collection import Collection
+from pymongo.database import Database
+import os
+import threading
+import time
+import logging
+from typing import Dict, Any, List, Optional
+from db_client import MongoClientManager, client_manager
+from settings import Settings, get_settings
+from shared_cache import shared_cache, ROUTING_NAMESPACE
+
+logger = logging.getLogger(__name__)
+
+class CollectionRouter:
+    """Resolve which database and collection hold the recipes.
+
+    Resolution happens once per process: the configured collection is used if
+    it has documents, otherwise the first non-empty fallback collection is, so
+    that a lookup costs a single query instead of probing every candidate.
+    With the shared cache enabled, reset() bumps a node-wide routing
+    generation and every worker resolves again once it notices.
+    """
+
+    # Seconds between two reads of the node-wide routing generation
+    CHECK_INTERVAL = 1.0
+
+    def __init__(self, manager: MongoClientManager, settings: Settings):
+        self._manager = manager
+        self._lock = threading.Lock()
+        self._resolved: Optional[Dict[str, str]] = None
+        self._pid: Optional[int] = None
+        # Routing generation the resolution was made under, and the latest one read
+        self._generation: Optional[int] = None
+        self._current: Optional[int] = None
+        self._checked_at = 0.0
+        self.db_name = settings.database_name
+        self.collection_name = settings.recipe_collection_name
+        self.fallback_collections = list(settings.recipe_fallback_collections)
+
+    @property
+    def candidates(self) -> List[str]:
+        """Collections that may hold recipes, the configured one first."""
+        names = [self.collection_name]
+        names.extend(name for name in self.fallback_collections if name not in names)
+        return names
+
+    def _resolve_database(self, client) -> str:
+        """Match the configured database name case-insensitively."""
+        try:
+            for name in client.list_database_names():
+                if name.lower() == self.db_name.lower():
+                    if name != self.db_name:
+                        logger.warning(f"Database name case mismatch: using '{name}', configured '{self.db_name}'")
+                    return name
+        except Exception as e:
+            logger.warning(f"Could not list databases, using configured name '{self.db_name}': {str(e)}")
+        return self.db_name
+
+    def _resolve(self) -> Dict[str, str]:
+        client = self._manager.get_client()
+        db_name = self._resolve_database(client)
+        db = client[db_name]
+        existing = set(db.list_collection_names())
+
+        collection_name = self.collection_name
+        for name in self.candidates:
+            if name in existing and db[name].find_one({}, {"_id": 1}) is not None:
+                collection_name = name
+                break
+
+        if collection_name != self.collection_name:
+            logger.warning(f"Configured collection '{self.collection_name}' is empty or missing, "
+                           f"routing recipes to '{collection_name}'")
+        logger.info(f"Recipe collection resolved to {db_name}.{collection_name}")
+        return {"database": db_name, "collection": collection_name}
+
+    def _routing_generation(self) -> Optional[int]:
+        """Node-wide routing generation, read at most once per CHECK_INTERVAL."""
+        if not shared_cache.enabled:
+            return None
+        now = time.monotonic()
+        if now - self._checked_at >= self.CHECK_INTERVAL or self._pid != os.getpid():
+            generation = shared_cache.generation(ROUTING_NAMESPACE)
+            # Unreadable: keep the last known one rather than resolve again
+            if generation is not None:
+                self._current = generation
+            self._checked_at = now
+        return self._current
+
+    def resolved(self) -> Dict[str, str]:
+        """Return the resolved database and collection names for this process."""
+        pid = os.getpid()
+        # Read before resolving, so a reset during the resolution is not lost
+        generation = self._routing_generation()
+        resolved = self._resolved
+        if resolved is not None and self._pid == pid and self._generation == generation:
+            return resolved
+        with self._lock:
+            if self._resolved is None or self._pid != pid or self._generation != generation:
+                self._resolved = self._resolve()
+                self._pid = pid
+                self._generation = generation
+            return self._resolved
+
+    def database(self) -> Database:
+        return self._manager.get_client()[self.resolved()["database"]]
+
+    def recipes(self) -> Collection:
+        """Return the collection that holds the recipes."""
+        resolved = self.resolved()
+        return self._manager.get_client()[resolved["database"]][resolved["collection"]]
+
+    def reset(self):
+        """Forget the resolved location so the next call resolves again, in every worker."""
+        with self._lock:
+            self._resolved = None
+            self._pid = None
+            self._checked_at = 0.0
+        if shared_cache.enabled:
+            shared_cache.bump(ROUTING_NAMESPACE)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "configured_database": self.db_name,
+            "configured_collection": self.collection_name,
+            "fallback_collections": self.fallback_collections,
+            "resolved": self._resolved if self._pid == os.getpid() else None
+        }
+
+collection_router = CollectionRouter(client_manager, get_settings())
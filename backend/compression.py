@@ -0,0 +1,135 @@
+import gzip
+import zlib
+import logging
+from typing import Iterable, Iterator, List, Optional
+from cache import LRUCache
+from etags import content_etag
+from settings import Settings, get_settings, on_reload
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Compressed bodies of responses with a strong ETag, keyed by a hash of the
+# body and the encoding: a version ETag alone would outlive edits that leave
+# updatedAt untouched
+compressed_cache = LRUCache(
+    max_size=get_settings().compression_cache_size,
+    ttl_seconds=get_settings().compression_cache_ttl_seconds
+)
+
+@on_reload
+def _configure_compressed_cache(old: Settings, new: Settings):
+    compressed_cache.configure(new.compression_cache_size, new.compression_cache_ttl_seconds)
+    if (old.compression_gzip_level, old.compression_brotli_quality, old.compression_zstd_level) != \
+            (new.compression_gzip_level, new.compression_brotli_quality, new.compression_zstd_level):
+        compressed_cache.clear()
+
+def available_encodings() -> List[str]:
+    """Encodings this process can produce, in order of server preference."""
+    encodings = []
+    if brotli is not None:
+        encodings.append('br')
+    if zstandard is not None:
+        encodings.append('zstd')
+    encodings.append('gzip')
+    return encodings
+
+SUPPORTED_ENCODINGS = tuple(available_encodings())
+
+def choose_encoding(accept_encodings) -> Optional[str]:
+    """Pick the best encoding the client accepts, preferring the client's q-values."""
+    best, best_quality = None, 0
+    for encoding in SUPPORTED_ENCODINGS:
+        quality = accept_encodings.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compress a complete body with the given encoding."""
+    settings = get_settings()
+    if encoding == 'br':
+        return brotli.compress(body, quality=settings.compression_brotli_quality)
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=settings.compression_zstd_level).compress(body)
+    return gzip.compress(body, compresslevel=settings.compression_gzip_level)
+
+def compress_stream(chunks: Iterable, encoding: str) -> Iterator[bytes]:
+    """Compress a streamed body incrementally, flushing after every chunk."""
+    settings = get_settings()
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=settings.compression_brotli_quality)
+        for chunk in chunks:
+            data = compressor.process(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+            data += compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+        return
+
+    if encoding == 'zstd':
+        compressor = zstandard.ZstdCompressor(level=settings.compression_zstd_level).compressobj()
+        flush_block, finish = zstandard.COMPRESSOBJ_FLUSH_BLOCK, zstandard.COMPRESSOBJ_FLUSH_FINISH
+    else:
+        compressor = zlib.compressobj(settings.compression_gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        flush_block, finish = zlib.Z_SYNC_FLUSH, zlib.Z_FINISH
+
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+        # Flush so each chunk reaches the client now, not when the stream ends
+        data += compressor.flush(flush_block)
+        if data:
+            yield data
+    yield compressor.flush(finish)
+
+def compress_response(request, response):
+    """Compress a Flask response according to the request's Accept-Encoding."""
+    settings = get_settings()
+    if not settings.compression_enabled or request.method == 'HEAD':
+        return response
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return response
+    if 'Content-Encoding' in response.headers:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    body = response.get_data()
+    # Small bodies are sent as-is; compressing them costs more than it saves
+    if len(body) < settings.compression_min_size:
+        return response
+
+    etag, weak = response.get_etag()
+    compressed = key = None
+    if etag and not weak:
+        key = (content_etag(body), encoding)
+        compressed = compressed_cache.get(key)
+    if compressed is None:
+        compressed = compress(body, encoding)
+        if key is not None:
+            compressed_cache.set(key, compressed)
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    if etag and not weak:
+        # Each encoding is a distinct representation and needs its own strong ETag
+        response.set_etag(f"{etag}-{encoding}")
+    return response
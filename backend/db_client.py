@@ -0,0 +1,192 @@
+from pymongo import MongoClient, monitoring
+import os
+import threading
+import logging
+from typing import Dict, Any, Optional
+from health_monitor import TopologyHealthMonitor
+from query_monitor import QueryMonitor
+from settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Connection pool listener that keeps running counters for monitoring."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = {
+                "connections_created": 0,
+                "connections_closed": 0,
+                "connections_checked_out": 0,
+                "connections_in_use": 0,
+                "checkout_failures": 0,
+                "pools_cleared": 0
+            }
+
+    def _incr(self, key: str, amount: int = 1):
+        with self._lock:
+            self.counters[key] += amount
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counters)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._incr("pools_cleared")
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._incr("connections_created")
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._incr("connections_closed")
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._incr("checkout_failures")
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.counters["connections_checked_out"] += 1
+            self.counters["connections_in_use"] += 1
+
+    def connection_checked_in(self, event):
+        self._incr("connections_in_use", -1)
+
+class MongoClientManager:
+    """Lazily creates one pooled MongoClient per process.
+
+    The client is bound to the PID that created it, so a client built in the
+    Gunicorn master under preload_app is never shared with forked workers:
+    each worker transparently builds its own on first use.
+    """
+
+    def __init__(self):
+        self._client: Optional[MongoClient] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self.pool_listener = PoolStatsListener()
+        self.health_monitor = TopologyHealthMonitor()
+        self.query_monitor = QueryMonitor(self.get_client)
+
+    def _listeners(self) -> list:
+        listeners = [self.pool_listener, self.health_monitor]
+        if get_settings().query_monitor_enabled:
+            listeners.append(self.query_monitor)
+        return listeners
+
+    @staticmethod
+    def _pool_options() -> Dict[str, Any]:
+        """Connection pool settings for new clients."""
+        settings = get_settings()
+        return {
+            "maxPoolSize": settings.db_max_pool_size,
+            "minPoolSize": settings.db_min_pool_size,
+            "maxIdleTimeMS": settings.db_max_idle_time_ms,
+            "waitQueueTimeoutMS": settings.db_wait_queue_timeout_ms,
+            "heartbeatFrequencyMS": settings.db_heartbeat_frequency_ms
+        }
+
+    def _create_client(self) -> MongoClient:
+        settings = get_settings()
+        db_host = settings.db_host
+        db_port = settings.db_port
+        db_user = settings.db_user
+        db_pass = settings.db_pass
+        db_uri = settings.mongodb_uri
+        db_timeout_ms = settings.db_timeout_ms
+        pool_options = self._pool_options()
+
+        if db_uri:
+            logger.info(f"Creating pooled MongoDB client using URI (host masked) in process {os.getpid()}")
+            client = MongoClient(
+                db_uri,
+                serverSelectionTimeoutMS=db_timeout_ms,
+                event_listeners=self._listeners(),
+                **pool_options
+            )
+        else:
+            logger.info(f"Creating pooled MongoDB client for {db_host}:{db_port} in process {os.getpid()}")
+            client = MongoClient(
+                host=db_host,
+                port=db_port,
+                username=db_user,
+                password=db_pass,
+                serverSelectionTimeoutMS=db_timeout_ms,
+                event_listeners=self._listeners(),
+                **pool_options
+            )
+        logger.info(f"MongoDB pool options: {pool_options}")
+        return client
+
+    def get_client(self) -> MongoClient:
+        """Return the client for the current process, creating it if needed."""
+        pid = os.getpid()
+        client = self._client
+        if client is not None and self._pid == pid:
+            return client
+
+        with self._lock:
+            if self._client is None or self._pid != pid:
+                # A client inherited across fork must not be used or closed
+                # here; its sockets belong to the parent process.
+                self.pool_listener.reset()
+                self.health_monitor = TopologyHealthMonitor()
+                self.query_monitor = QueryMonitor(self.get_client)
+                self._client = self._create_client()
+                self._pid = pid
+            return self._client
+
+    def reset_after_fork(self):
+        """Drop any client inherited from the parent process."""
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.pool_listener = PoolStatsListener()
+        self.health_monitor = TopologyHealthMonitor()
+        self.query_monitor = QueryMonitor(self.get_client)
+
+    def close(self):
+        """Close the client owned by this process."""
+        with self._lock:
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._client = None
+            self._pid = None
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Return pool configuration and usage counters for this process."""
+        return {
+            "pid": os.getpid(),
+            "client_initialized": self._client is not None and self._pid == os.getpid(),
+            "options": self._pool_options(),
+            "counters": self.pool_listener.snapshot()
+        }
+
+    def health(self) -> Dict[str, Any]:
+        """Return the cached topology health for this process."""
+        state = self.health_monitor.snapshot()
+        state["client_initialized"] = self._client is not None and self._pid == os.getpid()
+        return state
+
+client_manager = MongoClientManager()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=client_manager.reset_after_fork)
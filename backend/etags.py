@@ -0,0 +1,39 @@
+import hashlib
+from bson.raw_bson import RawBSONDocument
+from typing import Dict, Optional, Iterable
+
+# Field maintained by the write functions in server.py on every insert/update
+UPDATED_AT_FIELD = 'updatedAt'
+
+def content_etag(body: bytes) -> str:
+    """Strong ETag derived from the exact bytes of a response body."""
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+def version_etag(recipe: Optional[Dict]) -> Optional[str]:
+    """Strong ETag derived from a recipe's ID and last write time.
+
+    Returns None for documents that predate updatedAt tracking; those fall
+    back to a content hash. Raw BSON documents are hashed from their bytes,
+    which identifies the content exactly without decoding it.
+    """
+    if isinstance(recipe, RawBSONDocument):
+        return 'r-' + hashlib.blake2b(recipe.raw, digest_size=12).hexdigest()
+    if not recipe or not recipe.get(UPDATED_AT_FIELD) or '_id' not in recipe:
+        return None
+    raw = f"{recipe['_id']}:{recipe[UPDATED_AT_FIELD]}".encode('utf-8')
+    return 'v-' + hashlib.blake2b(raw, digest_size=12).hexdigest()
+
+def matching_etag(if_none_match, etag: str, encodings: Iterable[str] = ()) -> Optional[str]:
+    """Return the variant of an ETag that If-None-Match holds, or None.
+
+    Compressed responses carry "<etag>-<encoding>", so a client revalidating a
+    compressed copy must still match the identity ETag computed here. The 304
+    has to repeat the variant the client sent, not the identity ETag.
+    """
+    if etag in if_none_match:
+        return etag
+    for encoding in encodings:
+        variant = f"{etag}-{encoding}"
+        if variant in if_none_match:
+            return variant
+    return None
@@ -0,0 +1,84 @@
+from pymongo import monitoring
+import threading
+import time
+import logging
+from typing import Dict, Any
+
+logger = logging.getLogger(__name__)
+
+class TopologyHealthMonitor(monitoring.ServerHeartbeatListener):
+    """Track MongoDB reachability and latency from the driver's own heartbeats.
+
+    pymongo already runs a background monitor per server, so listening to its
+    heartbeats gives us an up-to-date view of the topology without adding a
+    round trip to any request.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._servers: Dict[str, Dict[str, Any]] = {}
+
+    def _server(self, address) -> Dict[str, Any]:
+        key = f"{address[0]}:{address[1]}"
+        server = self._servers.get(key)
+        if server is None:
+            server = {
+                "status": "unknown",
+                "latency_ms": None,
+                "last_success": None,
+                "last_failure": None,
+                "last_error": None,
+                "consecutive_failures": 0
+            }
+            self._servers[key] = server
+        return server
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        with self._lock:
+            server = self._server(event.connection_id)
+            if server["status"] == "down":
+                logger.info(f"MongoDB server {event.connection_id[0]}:{event.connection_id[1]} is reachable again")
+            server["status"] = "up"
+            # Awaited (streaming) heartbeats measure the wait, not the round trip
+            if not getattr(event, "awaited", False):
+                server["latency_ms"] = round(event.duration * 1000, 2)
+            server["last_success"] = time.time()
+            server["last_error"] = None
+            server["consecutive_failures"] = 0
+
+    def failed(self, event):
+        with self._lock:
+            server = self._server(event.connection_id)
+            if server["status"] != "down":
+                logger.warning(f"MongoDB server {event.connection_id[0]}:{event.connection_id[1]} heartbeat failed: {event.reply}")
+            server["status"] = "down"
+            server["last_failure"] = time.time()
+            server["last_error"] = str(event.reply)
+            server["consecutive_failures"] += 1
+
+    def is_down(self) -> bool:
+        """True only when every observed server has failed its last heartbeat."""
+        with self._lock:
+            if not self._servers:
+                return False
+            return all(s["status"] == "down" for s in self._servers.values())
+
+    def last_error(self) -> str:
+        with self._lock:
+            errors = [s["last_error"] for s in self._servers.values() if s["last_error"]]
+            return errors[-1] if errors else ""
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the cached topology state without touching the database."""
+        with self._lock:
+            servers = {key: dict(value) for key, value in self._servers.items()}
+        if not servers:
+            status = "unknown"
+        elif any(s["status"] == "up" for s in servers.values()):
+            status = "up"
+        else:
+            status = "down"
+        return {"status": status, "servers": servers}
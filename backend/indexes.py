@@ -0,0 +1,117 @@
+from pymongo import ASCENDING, IndexModel
+from pymongo.collection import Collection
+from pymongo.errors import OperationFailure
+import logging
+from typing import Dict, Any, List, Optional
+from settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Collation used for case-insensitive equality and prefix matching.
+# Queries must pass the same collation to be able to use these indexes.
+CASE_INSENSITIVE_COLLATION = {
+    "locale": get_settings().index_collation_locale,
+    "strength": 2
+}
+
+# Declared indexes for the recipe collection, keyed by index name
+RECIPE_INDEXES: List[Dict[str, Any]] = [
+    {"name": "category_1", "keys": [("category", ASCENDING)]},
+    {"name": "region_1", "keys": [("region", ASCENDING)]},
+    {"name": "favorite_1", "keys": [("favorite", ASCENDING)]},
+    {"name": "title_1", "keys": [("title", ASCENDING)]},
+    {"name": "recipeName_1", "keys": [("recipeName", ASCENDING)]},
+    # Case-insensitive matches on the dropdown fields and titles
+    {"name": "category_ci", "keys": [("category", ASCENDING)],
+     "collation": CASE_INSENSITIVE_COLLATION},
+    {"name": "region_ci", "keys": [("region", ASCENDING)],
+     "collation": CASE_INSENSITIVE_COLLATION},
+    {"name": "title_ci", "keys": [("title", ASCENDING)],
+     "collation": CASE_INSENSITIVE_COLLATION},
+    {"name": "category_1_region_1", "keys": [("category", ASCENDING), ("region", ASCENDING)]},
+    {"name": "favorite_1_category_1", "keys": [("favorite", ASCENDING), ("category", ASCENDING)]},
+    # Multikey indexes over every ingredient in a recipe. Case-sensitive
+    # searches run without a collation and can only use the simple one
+    {"name": "ingredients_name_1", "keys": [("ingredients.name", ASCENDING)]},
+    {"name": "ingredients_name_ci", "keys": [("ingredients.name", ASCENDING)],
+     "collation": CASE_INSENSITIVE_COLLATION},
+    {"name": "recipeName_ci", "keys": [("recipeName", ASCENDING)],
+     "collation": CASE_INSENSITIVE_COLLATION},
+    {"name": "origin_1", "keys": [("origin", ASCENDING)]},
+    {"name": "origin_ci", "keys": [("origin", ASCENDING)],
+     "collation": CASE_INSENSITIVE_COLLATION},
+    # Scanned by the change watcher when change streams are unavailable
+    {"name": "updatedAt_1", "keys": [("updatedAt", ASCENDING)]},
+]
+
+def _index_models() -> List[IndexModel]:
+    models = []
+    for spec in RECIPE_INDEXES:
+        options = {"name": spec["name"]}
+        if "collation" in spec:
+            options["collation"] = spec["collation"]
+        models.append(IndexModel(spec["keys"], **options))
+    return models
+
+def _same_collation(declared: Dict, actual: Dict) -> bool:
+    if not declared and not actual:
+        return True
+    if not declared or not actual:
+        # An index without collation reports none, or the simple locale
+        return (declared or actual).get("locale") == "simple"
+    return (declared.get("locale") == actual.get("locale")
+            and declared.get("strength", 3) == actual.get("strength", 3))
+
+def has_index(field: str, collation: Optional[Dict] = None) -> bool:
+    """Whether a declared index leads with the field under the given collation."""
+    return any(spec["keys"][0][0] == field and _same_collation(collation or {}, spec.get("collation") or {})
+               for spec in RECIPE_INDEXES)
+
+def index_drift(collection: Collection) -> Dict[str, Any]:
+    """Compare the declared indexes with the ones present on the collection."""
+    actual = collection.index_information()
+    declared_names = set()
+    missing, mismatched = [], []
+
+    for spec in RECIPE_INDEXES:
+        declared_names.add(spec["name"])
+        info = actual.get(spec["name"])
+        if info is None:
+            missing.append(spec["name"])
+            continue
+        keys = [(field, int(direction)) for field, direction in info.get("key", [])]
+        if keys != list(spec["keys"]) or not _same_collation(spec.get("collation"), info.get("collation")):
+            mismatched.append({
+                "name": spec["name"],
+                "declared": {"keys": spec["keys"], "collation": spec.get("collation")},
+                "actual": {"keys": keys, "collation": info.get("collation")}
+            })
+
+    unexpected = sorted(name for name in actual if name != "_id_" and name not in declared_names)
+    return {
+        "collection": collection.name,
+        "in_sync": not (missing or mismatched),
+        "missing": missing,
+        "mismatched": mismatched,
+        "unexpected": unexpected
+    }
+
+def ensure_indexes(collection: Collection) -> Dict[str, Any]:
+    """Create any missing declared indexes. Safe to run repeatedly."""
+    drift = index_drift(collection)
+    if drift["missing"]:
+        models = [model for model in _index_models() if model.document["name"] in drift["missing"]]
+        try:
+            created = collection.create_indexes(models)
+            logger.info(f"Created indexes on '{collection.name}': {created}")
+        except OperationFailure as e:
+            logger.error(f"Failed to create indexes on '{collection.name}': {str(e)}")
+            raise
+        drift = index_drift(collection)
+
+    if drift["mismatched"]:
+        # Never drop or rebuild an index implicitly; that is left to an operator
+        logger.warning(f"Index drift on '{collection.name}': {drift['mismatched']}")
+    if drift["unexpected"]:
+        logger.info(f"Undeclared indexes on '{collection.name}': {drift['unexpected']}")
+    return drift
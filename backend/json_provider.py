@@ -0,0 +1,106 @@
+from flask.json.provider import DefaultJSONProvider
+from bson.objectid import ObjectId
+from bson.decimal128 import Decimal128
+from bson.raw_bson import RawBSONDocument
+import bson
+from records import CompactRecord
+from datetime import datetime, timezone
+from decimal import Decimal
+import json
+import logging
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+def _isoformat(value: datetime) -> str:
+    """Format a datetime as ISO 8601 UTC, treating naive values (as pymongo returns) as UTC."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat() + 'Z'
+
+def _bson_default(o: Any) -> Any:
+    """Serialize the BSON and numeric types found in recipe documents."""
+    if isinstance(o, RawBSONDocument):
+        # Decoded here rather than when read, so the inflated dict only lives
+        # while this one document is being encoded. This saves memory, not CPU
+        return bson.decode(o.raw)
+    if isinstance(o, CompactRecord):
+        return o.to_document()
+    if isinstance(o, ObjectId):
+        return str(o)
+    if isinstance(o, Decimal128):
+        return str(o.to_decimal())
+    if isinstance(o, Decimal):
+        return str(o)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+def _stdlib_default(o: Any) -> Any:
+    if isinstance(o, datetime):
+        return _isoformat(o)
+    try:
+        return _bson_default(o)
+    except TypeError:
+        return DefaultJSONProvider.default(o)
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+    def _encode_record(doc: Any) -> Any:
+        encoded = orjson.dumps(doc, default=_orjson_default, option=_ORJSON_OPTIONS)
+        # orjson's output keeps its over-allocated buffer; keep an exact copy
+        return orjson.Fragment(bytes(memoryview(encoded)))
+
+    def _orjson_default(o: Any) -> Any:
+        # A record is encoded once and its JSON reused, instead of building
+        # its document again for every response (orjson >= 3.9)
+        if isinstance(o, CompactRecord) and hasattr(orjson, 'Fragment'):
+            return o.encoded(_encode_record)
+        return _bson_default(o)
+
+    def dumps_bytes(obj: Any, indent: bool = False) -> bytes:
+        """Encode an object to JSON bytes on the fastest available path."""
+        options = (_ORJSON_OPTIONS | orjson.OPT_INDENT_2) if indent else _ORJSON_OPTIONS
+        return orjson.dumps(obj, default=_orjson_default, option=options)
+
+    def loads(s: Any) -> Any:
+        return orjson.loads(s)
+else:
+    def dumps_bytes(obj: Any, indent: bool = False) -> bytes:
+        """Encode an object to JSON bytes on the fastest available path."""
+        return json.dumps(obj, default=_stdlib_default, ensure_ascii=False,
+                          indent=2 if indent else None,
+                          separators=None if indent else (',', ':')).encode('utf-8')
+
+    def loads(s: Any) -> Any:
+        return json.loads(s)
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson when it is installed.
+
+    ObjectId, datetime and Decimal128 are encoded natively, so documents read
+    from MongoDB can be returned without a formatting pass.
+    """
+
+    default = staticmethod(_stdlib_default)
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs:
+            # Callers asking for specific stdlib options get the stdlib encoder
+            kwargs.setdefault("default", self.default)
+            return json.dumps(obj, **kwargs)
+        return dumps_bytes(obj).decode('utf-8')
+
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        if kwargs:
+            return json.loads(s, **kwargs)
+        return loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        return self._app.response_class(dumps_bytes(obj, indent) + b'\n', mimetype=self.mimetype)
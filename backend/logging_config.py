@@ -0,0 +1,257 @@
+import os
+import sys
+import copy
+import json
+import time
+import atexit
+import random
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from settings import Settings, get_settings, on_reload
+
+try:
+    import fcntl
+except ImportError:  # Windows; rotation is then not coordinated between processes
+    fcntl = None
+
+try:
+    from gevent.monkey import get_original
+    # The listener must be a real thread even after gevent has patched threading
+    _start_new_thread, _allocate_lock = get_original('_thread', ['start_new_thread', 'allocate_lock'])
+    # and its queue one that blocks that thread, not the gevent hub
+    SimpleQueue = get_original('queue', 'SimpleQueue')
+except ImportError:
+    from _thread import start_new_thread as _start_new_thread, allocate_lock as _allocate_lock
+    from queue import SimpleQueue
+
+def _level(settings: Settings) -> int:
+    return getattr(logging, settings.log_level.upper(), logging.INFO)
+
+class JsonFormatter(logging.Formatter):
+    """Format each record as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "process": record.process,
+        }
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class SamplingFilter(logging.Filter):
+    """Keep only a share of the info and debug lines of noisy loggers.
+
+    Rates apply to a logger and its children, the most specific name wins.
+    Warnings and errors are never dropped.
+    """
+
+    def __init__(self, rates: Optional[Dict[str, float]] = None):
+        super().__init__()
+        self.sampled_out = 0
+        self.configure(rates or {})
+
+    def configure(self, rates: Dict[str, float]):
+        self.rates = dict(rates)
+        self._resolved: Dict[str, float] = {}
+
+    def _rate(self, name: str) -> float:
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate = 1.0
+            candidate = name
+            while candidate:
+                if candidate in self.rates:
+                    rate = self.rates[candidate]
+                    break
+                candidate = candidate.rpartition('.')[0]
+            self._resolved[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO or not self.rates:
+            return True
+        rate = self._rate(record.name)
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+class _SharedRolloverMixin:
+    """Rotate a log file that several worker processes append to.
+
+    Rollover runs under an exclusive lock on a sidecar file. A process that
+    finds the file already rotated by another one only reopens it.
+    """
+
+    def _rotated_elsewhere(self) -> bool:
+        if self.stream is None:
+            return False
+        try:
+            current = os.stat(self.baseFilename)
+        except FileNotFoundError:
+            return True
+        opened = os.fstat(self.stream.fileno())
+        return (current.st_dev, current.st_ino) != (opened.st_dev, opened.st_ino)
+
+    def doRollover(self):
+        with open(self.baseFilename + '.lock', 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            if self._rotated_elsewhere():
+                self.stream.close()
+                self.stream = self._open()
+                self._reopened()
+            else:
+                super().doRollover()
+
+    def _reopened(self):
+        pass
+
+class SharedRotatingFileHandler(_SharedRolloverMixin, logging.handlers.RotatingFileHandler):
+    pass
+
+class SharedTimedRotatingFileHandler(_SharedRolloverMixin, logging.handlers.TimedRotatingFileHandler):
+    def _reopened(self):
+        self.rolloverAt = self.computeRollover(int(time.time()))
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Enqueue records without ever blocking; drops them when the queue is full."""
+
+    def __init__(self, queue: SimpleQueue, max_size: int):
+        super().__init__(queue)
+        self.max_size = max_size
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge the arguments and render the traceback now, while they are
+        # current; the output formatters run later in the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or _traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        if self.queue.qsize() >= self.max_size:
+            self.dropped += 1
+            return
+        self.queue.put(record)
+
+class NativeQueueListener(logging.handlers.QueueListener):
+    """QueueListener that writes from an OS thread, outside the gevent loop."""
+
+    def start(self):
+        self._done = _allocate_lock()
+        self._done.acquire()
+        _start_new_thread(self._run, ())
+
+    def _run(self):
+        try:
+            self._monitor()
+        finally:
+            self._done.release()
+
+    def stop(self, timeout: float = 5.0):
+        if getattr(self, '_done', None) is None:
+            return
+        self.enqueue_sentinel()
+        self._done.acquire(timeout=timeout)
+        self._done = None
+
+_traceback_formatter = logging.Formatter()
+_queue_handler: Optional[DroppingQueueHandler] = None
+_listener: Optional[NativeQueueListener] = None
+_output_handlers: List[logging.Handler] = []
+_sampling = SamplingFilter()
+
+def _formatter(settings: Settings) -> logging.Formatter:
+    return JsonFormatter() if settings.log_json else logging.Formatter(settings.log_format)
+
+def _file_handler(settings: Settings) -> logging.Handler:
+    path = settings.log_file_path
+    if settings.log_rotation == 'size':
+        return SharedRotatingFileHandler(path, maxBytes=settings.log_max_bytes,
+                                         backupCount=settings.log_backup_count, encoding='utf-8')
+    if settings.log_rotation == 'time':
+        return SharedTimedRotatingFileHandler(path, when=settings.log_rotate_when,
+                                              backupCount=settings.log_backup_count, encoding='utf-8')
+    return logging.FileHandler(path, encoding='utf-8')
+
+def _start_listener():
+    global _listener
+    _listener = NativeQueueListener(_queue_handler.queue, *_output_handlers, respect_handler_level=False)
+    _listener.start()
+
+def _restart_in_child():
+    # The listener thread does not survive fork; the queue may hold a stale lock
+    _queue_handler.queue = SimpleQueue()
+    _start_listener()
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+def configure_logging():
+    """Route all logging through a queue to a background writer thread.
+
+    Callers only format and enqueue records; the console and log file are
+    written by the listener, so file I/O never blocks request handling. Safe
+    to call more than once; only the first call configures anything.
+    """
+    global _queue_handler
+    if _queue_handler is not None:
+        return
+    settings = get_settings()
+
+    # Create logs directory if it doesn't exist
+    log_dir = os.path.dirname(settings.log_file_path)
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+
+    formatter = _formatter(settings)
+    for handler in (logging.StreamHandler(sys.stderr), _file_handler(settings)):
+        handler.setFormatter(formatter)
+        _output_handlers.append(handler)
+
+    _sampling.configure(settings.sample_rates)
+    _queue_handler = DroppingQueueHandler(SimpleQueue(), settings.log_queue_size)
+    _queue_handler.addFilter(_sampling)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(_level(settings))
+
+    _start_listener()
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=_restart_in_child)
+    atexit.register(_stop_listener)
+
+def log_pipeline_stats() -> Dict[str, Any]:
+    """Return counters of the logging pipeline in this process."""
+    if _queue_handler is None:
+        return {"configured": False}
+    return {
+        "configured": True,
+        "queued": _queue_handler.queue.qsize(),
+        "dropped": _queue_handler.dropped,
+        "sampled_out": _sampling.sampled_out
+    }
+
+@on_reload
+def _apply_log_settings(old: Settings, new: Settings):
+    logging.getLogger().setLevel(_level(new))
+    _sampling.configure(new.sample_rates)
+    if old.log_json != new.log_json:
+        formatter = _formatter(new)
+        for handler in _output_handlers:
+            handler.setFormatter(formatter)
@@ -1,36 +1,133 @@
+import gc
 import os
 import logging
+from typing import Dict
 from gunicorn.app.base import BaseApplication
+from gunicorn.arbiter import Arbiter
+from gunicorn.workers.ggevent import GeventWorker
 from api import app
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
-
-# Configure logging
-log_level = os.getenv('LOG_LEVEL', 'info').upper()
-log_file = os.getenv('LOG_FILE_PATH', 'application.log')
-log_format = os.getenv('LOG_FORMAT', '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-
-# Create logs directory if it doesn't exist
-os.makedirs(os.path.dirname(log_file), exist_ok=True)
-
-logging.basicConfig(
-    level=getattr(logging, log_level, logging.INFO),
-    format=log_format,
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler(log_file)
-    ]
+from server import (
+    ensure_recipe_indexes, start_change_watcher, start_mirror, load_recipe_snapshot,
+    warm_vocabularies, MIRROR_ENABLED, DatabaseError
 )
+from db_client import client_manager
+from query_compiler import warm_plan_cache
+from metrics import reset_metrics_dir, mark_process_dead
+from settings import get_settings, reload_settings, install_reload_signal, RELOAD_SIGNAL
+from logging_config import configure_logging
+
+configure_logging()
 logger = logging.getLogger(__name__)
 
+def ensure_indexes_on_startup():
+    """Create missing recipe indexes unless disabled in the settings."""
+    if not get_settings().ensure_indexes_on_startup:
+        return
+    try:
+        drift = ensure_recipe_indexes()
+        if not drift["in_sync"]:
+            logger.warning(f"Recipe indexes are out of sync: {drift}")
+    except DatabaseError as e:
+        # The API can still serve requests without indexes, only slower
+        logger.error(f"Could not ensure recipe indexes: {str(e)}")
+
+# Build shared state in the Gunicorn master before the workers are forked
+PREFORK_WARMUP = get_settings().prefork_warmup
+# Include a snapshot of the recipe mirror in that state (needs MIRROR_ENABLED)
+PREFORK_SNAPSHOT = get_settings().prefork_snapshot
+
+def memory_usage() -> Dict[str, int]:
+    """Resident, proportional and shared memory of this process in KiB (Linux only)."""
+    usage = {}
+    try:
+        with open('/proc/self/smaps_rollup') as file:
+            for line in file:
+                key, _, value = line.partition(':')
+                if key in ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty'):
+                    usage[key.lower()] = int(value.split()[0])
+    except OSError:
+        pass
+    return usage
+
+def prefork_warmup():
+    """Load shared read-only state in the master process before forking.
+
+    With preload_app every worker inherits what is built here. gc.freeze()
+    moves it out of the collector's reach, so collections in the workers do
+    not write to those objects and their pages stay shared copy-on-write.
+    """
+    gc.disable()
+    ensure_indexes_on_startup()
+    logger.info(f"Warmed {warm_plan_cache()} query plans")
+    try:
+        # Interned strings only pay off in the records of a compact mirror
+        if MIRROR_ENABLED and get_settings().mirror_compact:
+            logger.info(f"Loaded vocabularies: {warm_vocabularies()}")
+        if MIRROR_ENABLED and PREFORK_SNAPSHOT:
+            logger.info(f"Loaded a snapshot of {load_recipe_snapshot()} recipes")
+    except Exception as e:
+        # Workers still warm up on their own, only without sharing the memory
+        logger.error(f"Pre-fork warmup incomplete: {str(e)}")
+    # MongoClient is not fork-safe; each worker opens its own after fork
+    client_manager.close()
+    gc.collect()
+    gc.freeze()
+    gc.enable()
+    logger.info(f"Pre-fork warmup done, master memory (KiB): {memory_usage()}")
+
+def post_fork(server, worker):
+    """Gunicorn hook run in each worker right after fork."""
+    # Forwarded by the master, see SettingsArbiter and SettingsWorker
+    install_reload_signal()
+    client_manager.reset_after_fork()
+
+def post_worker_init(worker):
+    """Gunicorn hook run in each worker once it has booted."""
+    if not PREFORK_WARMUP:
+        ensure_indexes_on_startup()
+    # Started after fork; threads do not survive into the workers
+    start_change_watcher()
+    start_mirror()
+    logger.info(f"Worker {os.getpid()} ready, memory (KiB): {memory_usage()}")
+
+def child_exit(server, worker):
+    """Gunicorn hook run in the master when a worker exits."""
+    mark_process_dead(worker.pid)
+
+def on_reload(server):
+    """Gunicorn hook run in the master on SIGHUP, before new workers are spawned."""
+    reload_settings()
+
+class SettingsArbiter(Arbiter):
+    """Gunicorn master that reloads settings in place on SIGUSR2.
+
+    The master reloads its own copy, which workers forked later inherit, and
+    forwards the signal to every worker. This replaces Gunicorn's binary
+    upgrade on SIGUSR2; SIGHUP still restarts the workers gracefully.
+    """
+
+    def handle_usr2(self):
+        reload_settings()
+        self.kill_workers(RELOAD_SIGNAL)
+
+class SettingsWorker(GeventWorker):
+    """Gevent worker that keeps the reload handler post_fork installs.
+
+    The base class resets every signal in SIGNALS to its default action when it
+    boots, and for SIGUSR2 that terminates the process, so a reload sent while
+    a worker boots would kill it. Leaving it out of the reset closes that window.
+    """
+
+    SIGNALS = [s for s in GeventWorker.SIGNALS if s != RELOAD_SIGNAL]
+
 class StandaloneApplication(BaseApplication):
     """Gunicorn application for WSGI server."""
     
-    def __init__(self, app, options=None):
+    def __init__(self, app, options=None, warmup=None):
         self.options = options or {}
         self.application = app
+        # Runs once where the app is loaded: in the master with preload_app
+        self.warmup = warmup
         super().__init__()
 
     def load_config(self):
@@ -39,18 +136,34 @@ class StandaloneApplication(BaseApplication):
                 self.cfg.set(key.lower(), value)
 
     def load(self):
+        if self.warmup is not None:
+            warmup, self.warmup = self.warmup, None
+            warmup()
         return self.application
 
+    def run(self):
+        try:
+            SettingsArbiter(self).run()
+        except RuntimeError as e:
+            logger.error(f"Gunicorn failed to start: {str(e)}")
+            raise SystemExit(1)
+
 if __name__ == "__main__":
-    # Get configuration from environment variables
-    host = os.getenv('HOST', '0.0.0.0')
-    port = int(os.getenv('PORT', '6088'))
-    workers = int(os.getenv('WORKERS', '3'))  # Default to CPU count * 2 + 1 in production
-    log_level = os.getenv('LOG_LEVEL', 'info')
+    settings = get_settings()
+    # Samples from a previous run would otherwise be added to this one
+    reset_metrics_dir()
+    host = settings.host
+    port = settings.port
+    workers = settings.workers  # Default to CPU count * 2 + 1 in production
+    log_level = settings.log_level
     
     # For development mode
-    if os.getenv('FLASK_ENV') == 'development':
+    if settings.development:
         logger.info("Starting in development mode")
+        install_reload_signal()
+        ensure_indexes_on_startup()
+        start_change_watcher()
+        start_mirror()
         app.run(debug=True, port=port, host=host)
     else:
         # For production mode with Gunicorn
@@ -58,14 +171,18 @@ if __name__ == "__main__":
         options = {
             'bind': f'{host}:{port}',
             'workers': workers,
-            'worker_class': 'gevent',  # Using gevent for better async performance
+            'worker_class': SettingsWorker,  # Using gevent for better async performance
             'timeout': 120,
             'loglevel': log_level,
             'accesslog': '-',  # Log to stdout
             'errorlog': '-',   # Log to stderr
             'reload': False,
             'preload_app': True,
-            'keepalive': 65  # Keep connections alive for 65 seconds
+            'keepalive': 65,  # Keep connections alive for 65 seconds
+            'post_fork': post_fork,
+            'post_worker_init': post_worker_init,
+            'child_exit': child_exit,
+            'on_reload': on_reload
         }
         
-        StandaloneApplication(app, options).run()
\ No newline at end of file
+        StandaloneApplication(app, options, warmup=prefork_warmup if PREFORK_WARMUP else None).run()
\ No newline at end of file
@@ -0,0 +1,127 @@
+import os
+import shutil
+import time
+import logging
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Optional, Tuple
+from flask import Flask, Response, g, request
+from settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = get_settings().metrics_enabled
+# Every process writes its samples to files in this directory, and the
+# endpoint aggregates all of them, so any worker reports the whole server
+METRICS_DIR = get_settings().metrics_dir
+
+if METRICS_ENABLED:
+    # prometheus_client picks its multiprocess storage when it is imported
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = METRICS_DIR
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+    from prometheus_client import multiprocess
+except ImportError:  # pragma: no cover - optional dependency
+    multiprocess = None
+
+# Reads served from memory take well under a millisecond
+LATENCY_BUCKETS: Tuple[float, ...] = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                                      0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+available = METRICS_ENABLED and multiprocess is not None
+
+if available:
+    # Labelled by Flask endpoint (the view function name), never by raw path
+    REQUESTS = Counter('recipebook_http_requests_total', 'HTTP requests handled',
+                       ['method', 'endpoint', 'status'])
+    REQUEST_LATENCY = Histogram('recipebook_http_request_duration_seconds',
+                                'Time until the response is ready to send, including compression',
+                                ['method', 'endpoint'], buckets=LATENCY_BUCKETS)
+    REQUEST_ERRORS = Counter('recipebook_http_request_errors_total', 'HTTP requests answered with a 5xx status',
+                             ['method', 'endpoint'])
+    DATA_LATENCY = Histogram('recipebook_data_function_duration_seconds', 'Time spent in server.py data functions',
+                             ['function'], buckets=LATENCY_BUCKETS)
+    DATA_ERRORS = Counter('recipebook_data_function_errors_total', 'server.py data function calls that raised',
+                          ['function'])
+    MONGO_LATENCY = Histogram('recipebook_mongo_command_duration_seconds', 'MongoDB command round trips',
+                              ['command', 'collection'], buckets=LATENCY_BUCKETS)
+    MONGO_FAILURES = Counter('recipebook_mongo_command_failures_total', 'MongoDB commands that failed',
+                             ['command', 'collection'])
+elif METRICS_ENABLED:
+    logger.warning("prometheus_client is not installed, /api/metrics is disabled")
+
+def reset_metrics_dir():
+    """Remove samples left by a previous run; call once before workers start."""
+    if available:
+        shutil.rmtree(METRICS_DIR, ignore_errors=True)
+        os.makedirs(METRICS_DIR, exist_ok=True)
+
+def mark_process_dead(pid: int):
+    """Drop the live samples of a worker that exited."""
+    if available:
+        multiprocess.mark_process_dead(pid)
+
+@contextmanager
+def track_data_call(name: str):
+    """Time a data function and count it as an error if it raises."""
+    if not available:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        DATA_ERRORS.labels(name).inc()
+        raise
+    finally:
+        DATA_LATENCY.labels(name).observe(time.perf_counter() - started)
+
+def observe_command(command: str, collection: str, seconds: float, failed: bool = False):
+    """Record one MongoDB command reported by the command listener."""
+    if not available:
+        return
+    MONGO_LATENCY.labels(command, collection).observe(seconds)
+    if failed:
+        MONGO_FAILURES.labels(command, collection).inc()
+
+def timed(func: Callable) -> Callable:
+    """Decorator recording the duration of a data function under its name."""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with track_data_call(func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
+
+def instrument_app(app: Flask):
+    """Record count, latency and errors of every request.
+
+    Call before registering other after_request hooks: Flask runs them in
+    reverse order, so the latency then includes their work.
+    """
+    if not available:
+        return
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            endpoint = request.endpoint or 'unmatched'
+            REQUEST_LATENCY.labels(request.method, endpoint).observe(time.perf_counter() - started)
+            REQUESTS.labels(request.method, endpoint, str(response.status_code)).inc()
+            if response.status_code >= 500:
+                REQUEST_ERRORS.labels(request.method, endpoint).inc()
+        return response
+
+def metrics_response() -> Optional[Response]:
+    """Render the metrics of all workers in the Prometheus text format."""
+    if not available:
+        return None
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=METRICS_DIR)
+    return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
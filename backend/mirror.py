@@ -0,0 +1,215 @@
+import re
+import threading
+import time
+import logging
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, List, Optional, Set
+from bson.objectid import ObjectId
+from pymongo.collection import Collection
+from records import RecipeRecord
+
+logger = logging.getLogger(__name__)
+
+def _equals(value: Any, expected: Any) -> bool:
+    # MongoDB does not treat true and 1 as equal, unlike Python
+    if isinstance(value, bool) or isinstance(expected, bool):
+        return value is expected
+    return value == expected
+
+def _value_matcher(condition: Any) -> Optional[Callable[[Any], bool]]:
+    """Matcher for one field condition, or None if it is not supported here."""
+    if isinstance(condition, dict):
+        if set(condition) != {"$regex"}:
+            return None
+        pattern = re.compile(condition["$regex"])
+        test = lambda value: isinstance(value, str) and pattern.match(value) is not None
+    elif isinstance(condition, (str, bool, int, float)):
+        test = lambda value: _equals(value, condition)
+    else:
+        return None
+    # Like MongoDB, a condition on an array field matches any of its elements
+    return lambda value: test(value) or (isinstance(value, (list, tuple)) and any(test(item) for item in value))
+
+def _any_element(doc: Dict, field: str, name_test: Callable[[Any], bool]) -> bool:
+    items = doc.get(field)
+    return isinstance(items, (list, tuple)) and any(
+        isinstance(item, Mapping) and name_test(item.get("name")) for item in items)
+
+def compile_filter(query: Dict[str, Any]) -> Optional[Callable[[Dict], bool]]:
+    """Turn a filter from query_compiler into an in-memory predicate.
+
+    Only covers case-sensitive equality, prefix regexes and ingredient
+    $elemMatch clauses; anything else returns None and is run by MongoDB.
+    """
+    clauses = query["$and"] if set(query) == {"$and"} else [{field: value} for field, value in query.items()]
+    tests = []
+    for clause in clauses:
+        if len(clause) != 1:
+            return None
+        field, condition = next(iter(clause.items()))
+        if field.startswith('$'):
+            return None
+        if isinstance(condition, dict) and set(condition) == {"$elemMatch"}:
+            element = condition["$elemMatch"]
+            if set(element) != {"name"}:
+                return None
+            name_test = _value_matcher(element["name"])
+            if name_test is None:
+                return None
+            tests.append(lambda doc, field=field, name_test=name_test: _any_element(doc, field, name_test))
+        else:
+            test = _value_matcher(condition)
+            if test is None or '.' in field:
+                return None
+            tests.append(lambda doc, field=field, test=test: field in doc and test(doc[field]))
+    return lambda doc: all(test(doc) for test in tests)
+
+def apply_projection(doc: Dict, projection: Optional[Dict[str, int]]) -> Optional[Dict]:
+    """Apply a top-level projection from projection.parse_projection to a document."""
+    if not projection:
+        return doc
+    if any(value == 1 for value in projection.values()):
+        projected = {field: doc[field] for field in projection if projection[field] == 1 and field in doc}
+        if projection.get('_id', 1) and '_id' in doc:
+            projected['_id'] = doc['_id']
+        return projected
+    return {field: value for field, value in doc.items() if field not in projection}
+
+class RecipeMirror:
+    """Complete in-process copy of the recipe collection for serving reads.
+
+    Loaded in the background when a worker boots and kept current through
+    the change watcher. Reads only use the mirror while it is loaded and the
+    watcher has confirmed it is caught up within `max_lag` seconds; otherwise
+    callers fall back to MongoDB. With `compact` set, documents are stored as
+    records.RecipeRecord instead of pymongo dicts.
+    """
+
+    def __init__(self, collection: Callable[[], Collection], lag: Callable[[], Optional[float]],
+                 max_lag: float = 10.0, compact: bool = True):
+        self.collection = collection
+        self.lag = lag
+        self.max_lag = max_lag
+        self.compact = compact
+        self._lock = threading.Lock()
+        self._docs: Dict[str, Mapping] = {}
+        # IDs changed while a load is running, re-read once it completes
+        self._pending: Optional[Set[str]] = None
+        self.ready = False
+        self.loaded_at: Optional[float] = None
+        self.load_seconds: Optional[float] = None
+        self.hits = 0
+        self.fallbacks = 0
+
+    def start(self):
+        """Load the collection in the background; reads fall back until it is done."""
+        if self._begin_load():
+            threading.Thread(target=self._load, name='recipe-mirror-load', daemon=True).start()
+
+    def load(self):
+        """Load the collection in the calling thread, e.g. before forking workers."""
+        if self._begin_load():
+            self._load()
+
+    def _begin_load(self) -> bool:
+        with self._lock:
+            if self._pending is not None:
+                return False
+            self.ready = False
+            self._pending = set()
+        return True
+
+    def _load(self):
+        started = time.time()
+        try:
+            docs = {str(doc['_id']): self._store(doc) for doc in self.collection().find({}).sort('_id', 1)}
+        except Exception as e:
+            logger.error(f"Failed to load recipe mirror: {str(e)}")
+            with self._lock:
+                self._pending = None
+            return
+        with self._lock:
+            self._docs = docs
+            pending, self._pending = self._pending, None
+        for id in pending:
+            self.refresh(id)
+        with self._lock:
+            self.ready = True
+            self.loaded_at = time.time()
+            self.load_seconds = round(self.loaded_at - started, 3)
+        logger.info(f"Recipe mirror loaded {len(docs)} recipes in {self.load_seconds}s")
+
+    def refresh(self, id: str):
+        """Re-read one recipe after it was inserted, updated or deleted."""
+        id = str(ObjectId(id))
+        with self._lock:
+            if self._pending is not None:
+                self._pending.add(id)
+            elif not self.ready:
+                # Not loaded yet; the load will read the current version
+                return
+        try:
+            doc = self.collection().find_one({"_id": ObjectId(id)})
+        except Exception as e:
+            # The copy can no longer be trusted until reloaded
+            logger.error(f"Failed to refresh recipe {id} in mirror: {str(e)}")
+            self.start()
+            return
+        record = self._store(doc) if doc is not None else None
+        with self._lock:
+            if record is None:
+                self._docs.pop(id, None)
+            else:
+                self._docs[id] = record
+
+    def _store(self, doc: Dict) -> Mapping:
+        return RecipeRecord.from_document(doc) if self.compact else doc
+
+    def fresh(self) -> bool:
+        """Whether reads can be served from the mirror right now."""
+        lag = self.lag()
+        usable = self.ready and lag is not None and lag <= self.max_lag
+        if not usable:
+            self.fallbacks += 1
+        return usable
+
+    def get(self, id: str) -> Optional[Dict]:
+        """Return a recipe, or None if the mirror does not hold it.
+
+        A miss is not proof the recipe is gone: one inserted moments ago may
+        not have reached the mirror yet, so callers should ask MongoDB.
+        """
+        doc = self._docs.get(str(ObjectId(id)))
+        if doc is None:
+            self.fallbacks += 1
+        else:
+            self.hits += 1
+        return doc
+
+    def find(self, predicate: Optional[Callable[[Dict], bool]] = None,
+             projection: Optional[Dict[str, int]] = None) -> Optional[List[Dict]]:
+        """Return matching recipes, or None if the projection needs MongoDB."""
+        if projection and any('.' in field for field in projection):
+            return None
+        self.hits += 1
+        docs = list(self._docs.values())
+        if predicate is not None:
+            docs = [doc for doc in docs if predicate(doc)]
+        return [apply_projection(doc, projection) for doc in docs]
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "loading": self._pending is not None,
+            "recipes": len(self._docs),
+            "compact": self.compact,
+            "loaded_at": self.loaded_at,
+            "load_seconds": self.load_seconds,
+            "lag_seconds": self.lag(),
+            "max_lag_seconds": self.max_lag,
+            "hits": self.hits,
+            "fallbacks": self.fallbacks
+        }
@@ -0,0 +1,75 @@
+from bson.objectid import ObjectId
+import base64
+import json
+from typing import Dict, Any, Optional, Tuple, List
+from settings import get_settings
+
+# Fields a page may be ordered by; _id is always the tie-breaker
+SORTABLE_FIELDS = ('_id', 'title', 'recipeName', 'category', 'region')
+
+class PaginationError(ValueError):
+    """Raised when pagination parameters from a client are invalid."""
+    pass
+
+def parse_limit(value: Optional[str]) -> int:
+    """Parse the limit query parameter, applying the default and the cap."""
+    settings = get_settings()
+    if value is None or value == '':
+        return settings.recipes_default_page_size
+    try:
+        limit = int(value)
+    except ValueError:
+        raise PaginationError(f"limit must be an integer, got '{value}'")
+    if limit < 1:
+        raise PaginationError("limit must be at least 1")
+    return min(limit, settings.recipes_max_page_size)
+
+def parse_sort(value: Optional[str]) -> str:
+    """Validate the sort key query parameter."""
+    if not value:
+        return '_id'
+    if value not in SORTABLE_FIELDS:
+        raise PaginationError(f"Cannot sort by '{value}', allowed fields: {', '.join(SORTABLE_FIELDS)}")
+    return value
+
+def encode_cursor(sort_key: str, document: Dict) -> str:
+    """Build an opaque cursor pointing just past the given document."""
+    payload = {"s": sort_key, "id": str(document['_id'])}
+    if sort_key != '_id':
+        payload["v"] = document.get(sort_key)
+    raw = json.dumps(payload, separators=(',', ':'), default=str).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str, sort_key: str) -> Tuple[ObjectId, Any]:
+    """Decode a cursor produced by encode_cursor for the same sort key."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        last_id = ObjectId(payload["id"])
+        cursor_sort = payload["s"]
+    except Exception:
+        raise PaginationError("Invalid pagination cursor")
+    if cursor_sort != sort_key:
+        raise PaginationError(f"Cursor was issued for sort '{cursor_sort}', not '{sort_key}'")
+    return last_id, payload.get("v")
+
+def keyset_filter(sort_key: str, last_id: ObjectId, last_value: Any) -> Dict:
+    """Return the query matching documents that sort after the cursor position."""
+    if sort_key == '_id':
+        return {"_id": {"$gt": last_id}}
+    if last_value is None:
+        # Missing/null values sort first, so everything with a value comes after
+        return {"$or": [
+            {sort_key: {"$ne": None}},
+            {sort_key: None, "_id": {"$gt": last_id}}
+        ]}
+    return {"$or": [
+        {sort_key: {"$gt": last_value}},
+        {sort_key: last_value, "_id": {"$gt": last_id}}
+    ]}
+
+def sort_spec(sort_key: str) -> List[Tuple[str, int]]:
+    """Return a deterministic sort specification for the given key."""
+    if sort_key == '_id':
+        return [('_id', 1)]
+    return [(sort_key, 1), ('_id', 1)]
@@ -0,0 +1,54 @@
+import re
+from typing import Dict, Optional, List
+
+# Named field sets that can be requested with ?fields=<profile>
+PROJECTION_PROFILES = {
+    # Everything the recipe grid needs to render a card
+    "summary": ("title", "recipeName", "category", "region", "time", "favorite"),
+}
+
+MAX_PROJECTION_FIELDS = 32
+
+_FIELD_PATTERN = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$')
+
+class ProjectionError(ValueError):
+    """Raised when a requested field projection is invalid."""
+    pass
+
+def _split_fields(value: str) -> List[str]:
+    fields = []
+    for name in (part.strip() for part in value.split(',')):
+        if not name:
+            continue
+        if name in PROJECTION_PROFILES:
+            fields.extend(PROJECTION_PROFILES[name])
+        elif _FIELD_PATTERN.match(name):
+            fields.append(name)
+        else:
+            raise ProjectionError(f"Invalid field name '{name}'")
+    if len(fields) > MAX_PROJECTION_FIELDS:
+        raise ProjectionError(f"At most {MAX_PROJECTION_FIELDS} fields may be requested")
+    return fields
+
+def parse_projection(fields: Optional[str] = None, exclude: Optional[str] = None) -> Optional[Dict[str, int]]:
+    """Turn the fields/exclude query parameters into a MongoDB projection.
+
+    Returns None when neither parameter is given, meaning full documents.
+    """
+    if fields and exclude:
+        raise ProjectionError("Use either 'fields' or 'exclude', not both")
+    if fields:
+        return {name: 1 for name in _split_fields(fields)}
+    if exclude:
+        return {name: 0 for name in _split_fields(exclude)}
+    return None
+
+def ensure_included(projection: Optional[Dict[str, int]], field: str) -> Optional[Dict[str, int]]:
+    """Make sure an inclusion projection still returns the given field."""
+    if not projection or field == '_id':
+        return projection
+    if any(value == 1 for value in projection.values()):
+        return {**projection, field: 1}
+    projection = dict(projection)
+    projection.pop(field, None)
+    return projection or None
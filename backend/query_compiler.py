@@ -0,0 +1,161 @@
+import re
+from functools import lru_cache
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple
+from indexes import CASE_INSENSITIVE_COLLATION, has_index
+
+# Flags the search bar sends alongside the criteria; they are not fields
+SEARCH_FLAGS = ('partial', 'caseInsensitive')
+
+# Fields matched by exact value, as picked from the search dropdowns
+EXACT_FIELDS = ('category', 'region')
+# Free-text fields that honour the partial/caseInsensitive flags
+TEXT_FIELDS = ('recipeName', 'title', 'origin')
+BOOLEAN_FIELDS = ('favorite',)
+
+MAX_INGREDIENTS = 10
+MAX_VALUE_LENGTH = 100
+
+# U+FFFF sorts after every other character, also under ICU collations,
+# so [prefix, prefix + U+FFFF) is an index range covering the prefix
+_PREFIX_UPPER_BOUND = '\uffff'
+
+class QueryError(ValueError):
+    """Raised when a search payload cannot be compiled into a safe query."""
+    pass
+
+class CompiledQuery(NamedTuple):
+    """A MongoDB filter plus the collation needed to run it on an index."""
+    filter: Dict[str, Any]
+    collation: Optional[Dict[str, Any]] = None
+
+def _match_mode(partial: bool, case_insensitive: bool) -> str:
+    if case_insensitive:
+        return 'ci_prefix' if partial else 'ci_equal'
+    return 'prefix' if partial else 'equal'
+
+def _condition(mode: str, value: str) -> Any:
+    """Build the condition for a text value in the given match mode."""
+    if mode in ('equal', 'ci_equal'):
+        return value
+    if mode == 'prefix':
+        return {"$regex": f"^{re.escape(value)}"}
+    # Case-insensitive prefix: a collation-aware range keeps index bounds tight,
+    # unlike a /^value/i regex which has to scan every index key
+    return {"$gte": value, "$lt": value + _PREFIX_UPPER_BOUND}
+
+@lru_cache(maxsize=256)
+def _plan(shape: Tuple[str, ...], partial: bool, case_insensitive: bool) -> Tuple[Tuple[str, str], ...]:
+    """Work out how each field of a normalized query shape is matched.
+
+    The shape holds sorted field names, never values, so every search with
+    the same structure shares one cached plan. String matches without a
+    declared index for their collation are rejected rather than left to
+    scan the collection.
+    """
+    text_mode = _match_mode(partial, case_insensitive)
+    collation = CASE_INSENSITIVE_COLLATION if case_insensitive else None
+    steps = []
+    for field in shape:
+        if field in BOOLEAN_FIELDS:
+            steps.append((field, 'bool'))
+            continue
+        if field in EXACT_FIELDS:
+            steps.append((field, 'ci_equal' if case_insensitive else 'equal'))
+        elif field in TEXT_FIELDS or field == 'ingredients':
+            steps.append((field, text_mode))
+        else:
+            continue
+        if not has_index('ingredients.name' if field == 'ingredients' else field, collation):
+            raise QueryError(f"Searching '{field}' {'case-insensitively' if case_insensitive else 'case-sensitively'} "
+                             "is not supported")
+    return tuple(steps)
+
+def warm_plan_cache() -> int:
+    """Compile the plans for single-field searches, the shapes the search bar sends most."""
+    for field in BOOLEAN_FIELDS + EXACT_FIELDS + TEXT_FIELDS + ('ingredients',):
+        for partial in (False, True):
+            for case_insensitive in (False, True):
+                try:
+                    _plan((field,), partial, case_insensitive)
+                except QueryError:
+                    pass
+    return _plan.cache_info().currsize
+
+def plan_cache_info() -> Dict[str, int]:
+    """Return hit/miss statistics for the compiled plan cache."""
+    info = _plan.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "max_size": info.maxsize}
+
+def _text_value(field: str, value: Any) -> str:
+    if not isinstance(value, str):
+        raise QueryError(f"'{field}' must be a string")
+    value = value.strip()
+    if not value:
+        raise QueryError(f"'{field}' must not be empty")
+    if len(value) > MAX_VALUE_LENGTH:
+        raise QueryError(f"'{field}' must be at most {MAX_VALUE_LENGTH} characters")
+    return value
+
+def _bool_value(field: str, value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.lower() in ('true', 'false'):
+        return value.lower() == 'true'
+    raise QueryError(f"'{field}' must be true or false")
+
+def _ingredient_values(value: Any) -> List[str]:
+    if isinstance(value, str):
+        value = value.split(',')
+    if not isinstance(value, list):
+        raise QueryError("'ingredients' must be a list of names")
+    # Skip blank entries left by trailing commas in the search bar
+    names = [_text_value('ingredients', name) for name in value if not (isinstance(name, str) and not name.strip())]
+    if not names:
+        raise QueryError("'ingredients' must contain at least one name")
+    if len(names) > MAX_INGREDIENTS:
+        raise QueryError(f"At most {MAX_INGREDIENTS} ingredients can be searched at once")
+    return names
+
+def compile_search(payload: Dict[str, Any]) -> CompiledQuery:
+    """Compile a search payload from the frontend into an indexable query.
+
+    Unknown fields and raw MongoDB operators are rejected, since they would
+    either force a collection scan or let clients run arbitrary queries.
+    """
+    if not isinstance(payload, dict):
+        raise QueryError("Search criteria must be a JSON object")
+
+    partial = _bool_value('partial', payload.get('partial', False))
+    case_insensitive = _bool_value('caseInsensitive', payload.get('caseInsensitive', False))
+
+    values: Dict[str, Any] = {}
+    for field in sorted(payload):
+        if field in SEARCH_FLAGS:
+            continue
+        value = payload[field]
+        if field in BOOLEAN_FIELDS:
+            values[field] = _bool_value(field, value)
+        elif field in EXACT_FIELDS or field in TEXT_FIELDS:
+            values[field] = _text_value(field, value)
+        elif field == 'ingredients':
+            values[field] = _ingredient_values(value)
+        else:
+            raise QueryError(f"Cannot search on '{field}'")
+
+    if not values:
+        raise QueryError("No search criteria provided")
+
+    shape = tuple(values)
+    clauses = []
+    for field, mode in _plan(shape, partial, case_insensitive):
+        value = values[field]
+        if mode == 'bool':
+            clauses.append({field: value})
+        elif field == 'ingredients':
+            clauses.extend({"ingredients": {"$elemMatch": {"name": _condition(mode, name)}}} for name in value)
+        else:
+            clauses.append({field: _condition(mode, value)})
+
+    query = clauses[0] if len(clauses) == 1 else {"$and": clauses}
+    collation = CASE_INSENSITIVE_COLLATION if case_insensitive else None
+    return CompiledQuery(query, collation)
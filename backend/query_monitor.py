@@ -0,0 +1,289 @@
+from pymongo import monitoring
+import os
+import json
+import queue
+import threading
+import time
+import logging
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from settings import get_settings
+from metrics import observe_command
+
+logger = logging.getLogger(__name__)
+# Slow queries and explain findings go to their own logger so they can be
+# routed or sampled separately from the rest of the application log
+slow_logger = logging.getLogger('slow_queries')
+
+# Driver housekeeping that says nothing about our queries
+IGNORED_COMMANDS = frozenset({
+    'hello', 'ismaster', 'isMaster', 'ping', 'buildInfo', 'buildinfo', 'saslStart', 'saslContinue',
+    'endSessions', 'explain', 'getnonce', 'authenticate', 'getLastError'
+})
+# Commands whose plan can be inspected with explain
+EXPLAINABLE_COMMANDS = frozenset({'find', 'aggregate', 'count', 'distinct'})
+# Fields added by the driver that explain does not accept inside the explained command
+_DRIVER_FIELDS = frozenset({'lsid', 'txnNumber', 'autocommit', 'startTransaction', 'readConcern', 'writeConcern'})
+
+# Reading this many documents per returned one means the index barely narrows the query
+POOR_SELECTIVITY_RATIO = 10
+# Below this many examined documents a scan is cheap whatever the plan
+MIN_EXAMINED_FOR_WARNING = 100
+
+MAX_SHAPES = 500
+MAX_CURSORS = 1000
+RECENT_SLOW_QUERIES = 50
+
+def query_shape(value: Any) -> Any:
+    """Replace the values of a filter with placeholders, keeping its structure."""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = [query_shape(item) for item in value if isinstance(item, (dict, list, tuple))]
+        # Lists of values ($in, $nin) only matter as a list, not by their length
+        return shapes or '?'
+    return '?'
+
+def _command_filter(name: str, command: Dict) -> Dict[str, Any]:
+    """The parts of a command that decide how it is executed."""
+    if name == 'find':
+        shape = {"filter": command.get('filter', {})}
+        if command.get('sort'):
+            shape["sort"] = {key: value for key, value in command['sort'].items()}
+        if command.get('collation'):
+            shape["collation"] = True
+        return shape
+    if name in ('count', 'distinct', 'findAndModify'):
+        shape = {"filter": command.get('query', {})}
+        if name == 'distinct':
+            shape["key"] = command.get('key')
+        return shape
+    if name == 'aggregate':
+        return {"pipeline": command.get('pipeline', [])}
+    if name in ('update', 'delete'):
+        statements = command.get('updates' if name == 'update' else 'deletes') or [{}]
+        return {"filter": statements[0].get('q', {})}
+    return {}
+
+def _shape_key(name: str, collection: str, command: Dict) -> str:
+    shape = _command_filter(name, command)
+    rendered = {key: value if key in ('sort', 'key', 'collation') else query_shape(value)
+                for key, value in shape.items()}
+    return f"{name} {collection} {json.dumps(rendered, sort_keys=True, default=str)}"
+
+def _returned(name: str, reply: Dict) -> Optional[int]:
+    """Number of documents a command returned or wrote, when the reply says."""
+    cursor = reply.get('cursor')
+    if isinstance(cursor, dict):
+        batch = cursor.get('firstBatch', cursor.get('nextBatch'))
+        return len(batch) if batch is not None else None
+    if name == 'distinct':
+        return len(reply.get('values', []))
+    if 'n' in reply:
+        return reply['n']
+    return None
+
+# Plans the optimizer considered but did not run
+_REJECTED_PLAN_FIELDS = ('rejectedPlans', 'allPlansExecution')
+
+def _walk(node: Any, visit: Callable[[Dict], None]):
+    if isinstance(node, dict):
+        visit(node)
+        for key, value in node.items():
+            if key not in _REJECTED_PLAN_FIELDS:
+                _walk(value, visit)
+    elif isinstance(node, list):
+        for value in node:
+            _walk(value, visit)
+
+def analyze_explain(explain: Dict) -> Dict[str, Any]:
+    """Summarize an explain result: plan stages, indexes and selectivity.
+
+    Works on find, count, distinct and aggregate explains, whose plans and
+    executionStats are nested at different depths.
+    """
+    stages: List[str] = []
+    indexes: List[str] = []
+    stats: Dict[str, Any] = {}
+
+    def visit(node: Dict):
+        if isinstance(node.get('stage'), str):
+            stages.append(node['stage'])
+            if node.get('indexName'):
+                indexes.append(node['indexName'])
+        execution = node.get('executionStats')
+        if isinstance(execution, dict) and not stats:
+            stats.update(execution)
+
+    _walk(explain, visit)
+
+    examined = stats.get('totalDocsExamined')
+    returned = stats.get('nReturned')
+    ratio = round(examined / max(returned, 1), 1) if examined is not None and returned is not None else None
+    problems = []
+    if 'COLLSCAN' in stages:
+        problems.append("collection scan")
+    if ratio is not None and ratio >= POOR_SELECTIVITY_RATIO and examined >= MIN_EXAMINED_FOR_WARNING:
+        problems.append(f"poor index selectivity ({examined} documents examined for {returned} returned)")
+    return {
+        "stages": list(dict.fromkeys(stages)),
+        "indexes": list(dict.fromkeys(indexes)),
+        "docs_examined": examined,
+        "keys_examined": stats.get('totalKeysExamined'),
+        "returned": returned,
+        "examined_per_returned": ratio,
+        "problems": problems
+    }
+
+class QueryMonitor(monitoring.CommandListener):
+    """Command listener recording what every MongoDB command costs.
+
+    Commands are grouped by shape (command, collection, and the filter with
+    its values replaced by placeholders), so the same query with different
+    arguments adds up in one entry. Commands slower than SLOW_QUERY_MS are
+    logged to the slow_queries logger. With QUERY_EXPLAIN_ENABLED each new
+    read shape is explained once in the background, flagging collection
+    scans and poorly selective indexes.
+    """
+
+    def __init__(self, get_client: Callable[[], Any]):
+        self.get_client = get_client
+        self._lock = threading.Lock()
+        self._inflight: Dict[Tuple[Any, int], Tuple[str, str, str, Dict]] = {}
+        self._cursors: Dict[int, str] = {}
+        self._shapes: Dict[str, Dict[str, Any]] = {}
+        self._explained: set = set()
+        self.recent_slow = deque(maxlen=RECENT_SLOW_QUERIES)
+        self.commands = 0
+        self.slow = 0
+        self.failures = 0
+        self._explain_queue: Optional[queue.Queue] = None
+        self._explain_pid: Optional[int] = None
+
+    def started(self, event):
+        name = event.command_name
+        if name in IGNORED_COMMANDS:
+            return
+        command = event.command
+        if name == 'killCursors':
+            with self._lock:
+                for cursor_id in command.get('cursors', []):
+                    self._cursors.pop(cursor_id, None)
+            return
+        if name == 'getMore':
+            key = self._cursors.get(command.get(name))
+            collection = command.get('collection', '')
+        else:
+            collection = command.get(name)
+            collection = collection if isinstance(collection, str) else ''
+            key = _shape_key(name, collection, command)
+        with self._lock:
+            self._inflight[(event.connection_id, event.request_id)] = (
+                name, collection, key or f"getMore {collection}", command)
+
+    def succeeded(self, event):
+        self._finish(event, event.reply)
+
+    def failed(self, event):
+        self._finish(event, None)
+
+    def _finish(self, event, reply: Optional[Dict]):
+        with self._lock:
+            entry = self._inflight.pop((event.connection_id, event.request_id), None)
+        if entry is None:
+            return
+        name, collection, key, command = entry
+        duration_ms = event.duration_micros / 1000.0
+        returned = _returned(name, reply) if reply is not None else None
+        observe_command(name, collection, duration_ms / 1000.0, failed=reply is None)
+
+        with self._lock:
+            self.commands += 1
+            if reply is None:
+                self.failures += 1
+            if isinstance(reply, dict) and name in ('find', 'aggregate'):
+                cursor_id = (reply.get('cursor') or {}).get('id')
+                if cursor_id and len(self._cursors) < MAX_CURSORS:
+                    self._cursors[cursor_id] = key
+            elif name == 'getMore' and reply is not None and not (reply.get('cursor') or {}).get('id'):
+                self._cursors.pop(command.get('getMore'), None)
+            shape = self._shapes.get(key)
+            if shape is None and len(self._shapes) < MAX_SHAPES:
+                shape = self._shapes[key] = {
+                    "command": name, "collection": collection, "shape": key,
+                    "count": 0, "failures": 0, "total_ms": 0.0, "max_ms": 0.0, "returned": 0, "plan": None
+                }
+            if shape is not None:
+                shape["count"] += 1
+                shape["failures"] += reply is None
+                shape["total_ms"] += duration_ms
+                shape["max_ms"] = max(shape["max_ms"], duration_ms)
+                shape["returned"] += returned or 0
+
+        settings = get_settings()
+        if duration_ms >= settings.slow_query_ms:
+            self._record_slow(key, duration_ms, returned, reply is None)
+        if (settings.query_explain_enabled and name in EXPLAINABLE_COMMANDS and reply is not None
+                and key not in self._explained and len(self._explained) < MAX_SHAPES):
+            self._explained.add(key)
+            self._submit_explain(key, event.database_name, name, command)
+
+    def _record_slow(self, key: str, duration_ms: float, returned: Optional[int], failed: bool):
+        with self._lock:
+            self.slow += 1
+            self.recent_slow.append({
+                "at": time.time(), "shape": key, "duration_ms": round(duration_ms, 2),
+                "returned": returned, "failed": failed
+            })
+        slow_logger.warning("Slow query %.1f ms, %s documents: %s", duration_ms, returned, key)
+
+    def _submit_explain(self, key: str, database: str, name: str, command: Dict):
+        # Explain runs off the request path, in one background thread per process
+        if self._explain_pid != os.getpid():
+            self._explain_queue = queue.Queue(maxsize=100)
+            self._explain_pid = os.getpid()
+            threading.Thread(target=self._explain_loop, args=(self._explain_queue,),
+                             name='query-explain', daemon=True).start()
+        explained = {field: value for field, value in command.items()
+                     if not field.startswith('$') and field not in _DRIVER_FIELDS}
+        try:
+            self._explain_queue.put_nowait((key, database, explained))
+        except queue.Full:
+            self._explained.discard(key)
+
+    def _explain_loop(self, jobs: queue.Queue):
+        while True:
+            key, database, command = jobs.get()
+            try:
+                result = self.get_client()[database].command(
+                    {"explain": command, "verbosity": "executionStats"})
+                plan = analyze_explain(result)
+            except Exception as e:
+                logger.error(f"Failed to explain {key}: {str(e)}")
+                continue
+            with self._lock:
+                if key in self._shapes:
+                    self._shapes[key]["plan"] = plan
+            if plan["problems"]:
+                slow_logger.warning("Query plan problem (%s), stages %s, indexes %s: %s",
+                                    ', '.join(plan["problems"]), plan["stages"], plan["indexes"] or 'none', key)
+
+    def stats(self, limit: int = 20) -> Dict[str, Any]:
+        """Return the most expensive query shapes and the latest slow queries."""
+        settings = get_settings()
+        with self._lock:
+            shapes = sorted(self._shapes.values(), key=lambda shape: shape["total_ms"], reverse=True)
+            top = [dict(shape, total_ms=round(shape["total_ms"], 2), max_ms=round(shape["max_ms"], 2),
+                        avg_ms=round(shape["total_ms"] / shape["count"], 2))
+                   for shape in shapes[:limit]]
+            return {
+                "pid": os.getpid(),
+                "slow_query_ms": settings.slow_query_ms,
+                "explain_enabled": settings.query_explain_enabled,
+                "commands": self.commands,
+                "failures": self.failures,
+                "slow": self.slow,
+                "shapes_tracked": len(self._shapes),
+                "top_shapes": top,
+                "recent_slow": list(self.recent_slow)
+            }
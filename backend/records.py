@@ -0,0 +1,148 @@
+import sys
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, FrozenSet, Iterator, Tuple
+
+class Vocabulary:
+    """Interning table so repeated values share a single string object."""
+
+    __slots__ = ('name', '_values')
+
+    def __init__(self, name: str):
+        self.name = name
+        self._values: Dict[str, str] = {}
+
+    def intern(self, value: Any) -> Any:
+        if not isinstance(value, str):
+            return value
+        return self._values.setdefault(value, value)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+UNITS = Vocabulary('units')
+CATEGORIES = Vocabulary('categories')
+REGIONS = Vocabulary('regions')
+INGREDIENT_NAMES = Vocabulary('ingredient_names')
+
+def vocabulary_sizes() -> Dict[str, int]:
+    return {vocabulary.name: len(vocabulary) for vocabulary in (UNITS, CATEGORIES, REGIONS, INGREDIENT_NAMES)}
+
+def load_vocabularies(collection) -> Dict[str, int]:
+    """Intern the distinct values already stored in a recipe collection."""
+    for vocabulary, field in ((CATEGORIES, 'category'), (REGIONS, 'region'),
+                              (UNITS, 'ingredients.unit'), (INGREDIENT_NAMES, 'ingredients.name')):
+        for value in collection.distinct(field):
+            vocabulary.intern(value)
+    return vocabulary_sizes()
+
+# Key orders seen so far; records with the same layout share one tuple
+_ORDERS: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+def _shared_order(keys: Tuple[str, ...]) -> Tuple[str, ...]:
+    return _ORDERS.setdefault(keys, keys)
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, CompactRecord):
+        return value.to_document()
+    # Tuples of strings and numbers encode as JSON arrays as they are
+    if isinstance(value, tuple) and any(isinstance(item, CompactRecord) for item in value):
+        return [_plain(item) for item in value]
+    return value
+
+class CompactRecord(Mapping):
+    """Read-only document stored in __slots__ instead of a per-document dict.
+
+    Known fields live in slots (an unset slot is a missing field), values of
+    fields with a vocabulary are interned and lists become tuples. Fields the
+    schema does not know about are kept in a small overflow dict. The stored
+    key order is kept too, so a record serializes to the same bytes as the
+    document it came from. Records act as mappings, so code written for
+    pymongo documents can read them as is.
+    """
+
+    __slots__ = ()
+    FIELDS: Tuple[str, ...] = ()
+    FIELD_SET: FrozenSet[str] = frozenset()
+    # Fields that may hold nested records
+    NESTED: Tuple[str, ...] = ()
+    VOCABULARIES: Dict[str, Vocabulary] = {}
+
+    @classmethod
+    def from_document(cls, doc: Dict[str, Any]) -> 'CompactRecord':
+        record = cls.__new__(cls)
+        extra = None
+        for key, value in doc.items():
+            if key in cls.FIELD_SET:
+                setattr(record, key, cls._compact(key, value))
+            else:
+                if extra is None:
+                    extra = {}
+                extra[sys.intern(key)] = value
+        record._extra = extra
+        record._order = _shared_order(tuple(sys.intern(key) for key in doc))
+        record._encoded = None
+        return record
+
+    @classmethod
+    def _compact(cls, key: str, value: Any) -> Any:
+        vocabulary = cls.VOCABULARIES.get(key)
+        return vocabulary.intern(value) if vocabulary is not None else value
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self.FIELD_SET:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._order)
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def to_document(self) -> Dict[str, Any]:
+        """Return the document in the shape the API serializes, keys in stored order."""
+        doc = {field: self[field] for field in self._order}
+        for field in self.NESTED:
+            if field in doc:
+                doc[field] = _plain(doc[field])
+        return doc
+
+    def encoded(self, encode: Callable[[Dict[str, Any]], Any]) -> Any:
+        """Return encode(self.to_document()), computed on first use only.
+
+        Records are never modified; a changed document gets a new record, so
+        the cached value cannot go stale.
+        """
+        if self._encoded is None:
+            self._encoded = encode(self.to_document())
+        return self._encoded
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_document()!r})"
+
+class Ingredient(CompactRecord):
+    FIELDS = ('name', 'quantity', 'unit')
+    FIELD_SET = frozenset(FIELDS)
+    VOCABULARIES = {'name': INGREDIENT_NAMES, 'unit': UNITS}
+    __slots__ = FIELDS + ('_extra', '_order', '_encoded')
+
+class RecipeRecord(CompactRecord):
+    FIELDS = ('_id', 'recipeName', 'title', 'origin', 'category', 'portion', 'region', 'time',
+              'favorite', 'ingredients', 'steps', 'notes', 'updatedAt')
+    FIELD_SET = frozenset(FIELDS)
+    NESTED = ('ingredients',)
+    VOCABULARIES = {'category': CATEGORIES, 'region': REGIONS}
+    __slots__ = FIELDS + ('_extra', '_order', '_encoded')
+
+    @classmethod
+    def _compact(cls, key: str, value: Any) -> Any:
+        if key == 'ingredients' and isinstance(value, list):
+            return tuple(Ingredient.from_document(item) if isinstance(item, dict) else item for item in value)
+        if key in ('steps', 'notes') and isinstance(value, list):
+            return tuple(value)
+        return super()._compact(key, value)
@@ -3,167 +3,357 @@ from bson.objectid import ObjectId
 import json
 import os
 import logging
-from typing import Tuple, List, Dict, Any, Optional
+from typing import Tuple, List, Dict, Any, Optional, Iterator
+from itertools import chain
 from functools import wraps
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()  # This will load from .env by default
-
-# Configure logging
-log_level = os.getenv('LOG_LEVEL', 'info').upper()
-log_file = os.getenv('LOG_FILE_PATH', 'app.log')
-log_format = os.getenv('LOG_FORMAT', '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-
-# Create logs directory if it doesn't exist
-os.makedirs(os.path.dirname(log_file), exist_ok=True)
-
-logging.basicConfig(
-    level=getattr(logging, log_level, logging.INFO),
-    format=log_format,
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler(log_file)
-    ]
-)
+from settings import Settings, get_settings, on_reload
+from db_client import client_manager
+from collection_router import collection_router
+from pagination import encode_cursor, keyset_filter, sort_spec
+from projection import ensure_included
+from indexes import ensure_indexes, index_drift
+from query_compiler import CompiledQuery
+from cache import recipe_cache
+from shared_cache import shared_cache, recipe_namespace, LIST_NAMESPACE
+from change_watcher import ChangeWatcher
+from mirror import RecipeMirror, compile_filter
+from records import load_vocabularies
+from singleflight import SingleFlight, coalesced
+from batch_loader import BatchLoader
+from metrics import timed, track_data_call
+from etags import UPDATED_AT_FIELD
+from datetime import datetime, timezone
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+
 logger = logging.getLogger(__name__)
 
 class DatabaseError(Exception):
     """Custom exception for database operations."""
     pass
 
+# Identical concurrent reads in this worker share one database call
+read_flight = SingleFlight()
+
 def db_connection(func):
     """Decorator to handle database connections and errors."""
     @wraps(func)
     def wrapper(*args, **kwargs):
-        client = None
         try:
-            client = get_db_client()
-            db = client["RecipeDB"]
-            db_recipe = db["Food"]
-            result = func(db_recipe, *args, **kwargs)
+            with track_data_call(func.__name__):
+                get_db_client()
+                db_recipe = collection_router.recipes()
+                result = func(db_recipe, *args, **kwargs)
             return result
         except Exception as e:
             logger.error(f"Database error in {func.__name__}: {str(e)}")
             raise DatabaseError(f"Database operation failed: {str(e)}")
-        finally:
-            if client:
-                client.close()
     return wrapper
 
 def get_db_client() -> MongoClient:
-    """Create and return a MongoDB client with error handling."""
+    """Return the pooled MongoDB client shared by this worker process."""
     try:
-        # Get database connection parameters from environment variables
-        db_host = os.getenv('DB_HOST', 'localhost')
-        db_port = int(os.getenv('DB_PORT', '27017'))
-        db_user = os.getenv('DB_USER', 'root')
-        db_pass = os.getenv('DB_PASS', 'root')
-        db_uri = os.getenv('MONGODB_URI')
-        db_timeout_ms = int(os.getenv('DB_TIMEOUT_MS', '5000'))
-        
-        if db_uri:
-            logger.info(f"Connecting to MongoDB using URI (host masked)")
-            client = MongoClient(
-                db_uri,
-                serverSelectionTimeoutMS=db_timeout_ms
-            )
-        else:
-            logger.info(f"Connecting to MongoDB at {db_host}:{db_port}")
-            client = MongoClient(
-                host=db_host, 
-                port=db_port,
-                username=db_user,
-                password=db_pass,
-                serverSelectionTimeoutMS=db_timeout_ms
-            )
-        
-        # Verify connection
-        client.server_info()
-        return client
+        client = client_manager.get_client()
     except Exception as e:
         logger.error(f"Failed to connect to database: {str(e)}")
         raise DatabaseError(f"Failed to connect to database: {str(e)}")
 
+    # Reject requests immediately when the health monitor has seen every server fail
+    if get_settings().db_fail_fast and client_manager.health_monitor.is_down():
+        error = client_manager.health_monitor.last_error()
+        logger.error(f"MongoDB is unreachable, failing fast: {error}")
+        raise DatabaseError(f"Failed to connect to database: {error}")
+    return client
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Return connection pool statistics for the current worker."""
+    return client_manager.pool_stats()
+
+def get_query_stats() -> Dict[str, Any]:
+    """Return the costliest query shapes and recent slow queries of the current worker."""
+    return client_manager.query_monitor.stats()
+
+def get_db_health() -> Dict[str, Any]:
+    """Return the monitored database state without a synchronous round trip."""
+    # Creating the client is non-blocking and starts the background monitors
+    client_manager.get_client()
+    return client_manager.health()
+
+RAW_CODEC_OPTIONS = CodecOptions(document_class=RawBSONDocument)
+
+def _reader(db_recipe):
+    """Return the collection handle used for API reads."""
+    # Results stay raw BSON; the JSON provider decodes each one as it encodes it
+    if get_settings().lazy_bson_decode:
+        return db_recipe.with_options(codec_options=RAW_CODEC_OPTIONS)
+    return db_recipe
+
 def _format_recipe(recipe: Dict) -> Dict:
-    """Convert ObjectId to string in recipe document."""
+    """Convert ObjectId and the write timestamp to strings in recipe document.
+
+    API responses don't need this; the Flask JSON provider encodes BSON types
+    directly. It is kept for writing recipes with the stdlib json module.
+    """
     if recipe and '_id' in recipe:
         recipe['_id'] = str(recipe['_id'])
+    if recipe and isinstance(recipe.get(UPDATED_AT_FIELD), datetime):
+        recipe[UPDATED_AT_FIELD] = recipe[UPDATED_AT_FIELD].isoformat(timespec='milliseconds') + 'Z'
     return recipe
 
+def _recipe_generation(id: str) -> Optional[int]:
+    """Shared generation of a recipe, or None when only this worker caches it."""
+    return shared_cache.generation(recipe_namespace(id)) if shared_cache.enabled else None
+
+def _shared_unreadable(generation: Optional[int]) -> bool:
+    """True when the shared generation could not be read, so nothing is cached."""
+    return generation is None and shared_cache.enabled
+
+def _cached_recipe(id: str, generation: Optional[int]) -> Optional[Dict]:
+    """Return a worker-cached recipe unless another worker has written it since."""
+    if _shared_unreadable(generation):
+        return None
+    entry = recipe_cache.get(id)
+    if entry is None or entry[0] != generation:
+        return None
+    return entry[1]
+
+def forget_recipe(id: str):
+    """Drop this worker's in-memory copies of a recipe."""
+    id = str(ObjectId(id))
+    recipe_cache.invalidate(id)
+    if MIRROR_ENABLED:
+        recipe_mirror.refresh(id)
+
+def forget_all():
+    """Drop every recipe this worker holds in memory."""
+    recipe_cache.clear()
+    if MIRROR_ENABLED:
+        recipe_mirror.start()
+
+def invalidate_recipe(id: str):
+    """Drop cached copies of a recipe and the lists it appears in, in every worker."""
+    id = str(ObjectId(id))
+    forget_recipe(id)
+    if shared_cache.enabled:
+        shared_cache.bump(recipe_namespace(id), LIST_NAMESPACE)
+
+def invalidate_all():
+    """Drop every cached recipe and list, in every worker."""
+    forget_all()
+    if shared_cache.enabled:
+        shared_cache.clear()
+
+# Invalidate caches on writes made by other workers and nodes. The watcher
+# bumps the shared generations itself, and calls these for this worker's memory
+CHANGE_WATCHER_ENABLED = get_settings().change_watcher_enabled
+change_watcher = ChangeWatcher(
+    collection_router.recipes,
+    on_change=forget_recipe,
+    on_reset=forget_all,
+    mode=get_settings().change_watcher_mode,
+    poll_interval=get_settings().change_poll_interval_seconds,
+    poll_overlap=get_settings().change_poll_overlap_seconds
+)
+
+# Serve reads from a complete in-process copy of the collection
+MIRROR_ENABLED = get_settings().mirror_enabled
+recipe_mirror = RecipeMirror(
+    collection_router.recipes,
+    lag=change_watcher.lag,
+    max_lag=get_settings().mirror_max_lag_seconds,
+    compact=get_settings().mirror_compact
+)
+
+def start_change_watcher():
+    """Start the change watcher in this worker when enabled."""
+    # The mirror is kept current by the watcher, so it needs one too
+    if CHANGE_WATCHER_ENABLED or MIRROR_ENABLED:
+        change_watcher.start()
+
+def start_mirror():
+    """Begin loading the recipe mirror in this worker unless a snapshot was inherited.
+
+    An inherited snapshot is brought up to date by the change watcher, from
+    the position recorded with it; one older than the change log reaches
+    back is reloaded instead.
+    """
+    if MIRROR_ENABLED and not recipe_mirror.ready:
+        recipe_mirror.start()
+
+def load_recipe_snapshot() -> int:
+    """Load the mirror in the calling process, for workers to inherit across fork.
+
+    The change watcher position is recorded first and inherited with the
+    snapshot, so each worker replays every change made after it was taken.
+    """
+    change_watcher.prime()
+    recipe_mirror.load()
+    return len(recipe_mirror)
+
 @db_connection
-def getRecipe(db_recipe, id: str) -> Optional[Dict]:
-    """Get a single recipe by ID."""
-    try:
-        # Get database collection information from environment variables
-        collection_name = os.getenv('RECIPE_COLLECTION_NAME', 'recipes')
-        db_name = os.getenv('MONGO_DATABASE', 'recipeDB')
-        
-        logger.info(f"Looking up recipe with ID: {id}")
-        logger.info(f"Current collection: {db_recipe.name}, Target collection: {collection_name}")
-        logger.info(f"Current database: {db_recipe.database.name}, Target database: {db_name}")
-        
-        # Get database client
-        client = db_recipe.database.client
-        
-        # CRITICAL FIX: Use case-insensitive comparison for database name
-        actual_db_name = db_recipe.database.name
-        if actual_db_name.lower() != db_name.lower():
-            logger.warning(f"Database name case mismatch: current '{actual_db_name}', expected '{db_name}'")
-            # Just use the actual database rather than trying to switch
-            db = db_recipe.database
+def warm_vocabularies(db_recipe) -> Dict[str, int]:
+    """Intern the categories, regions, units and ingredient names already stored."""
+    return load_vocabularies(db_recipe)
+
+@timed
+def getRecipe(id: str) -> Optional[Dict]:
+    """Get a single recipe by ID, served from the worker cache when possible."""
+    # One spelling of the ID for every cache key, whatever case the client used
+    id = str(ObjectId(id))
+    if MIRROR_ENABLED and recipe_mirror.fresh():
+        recipe = recipe_mirror.get(id)
+        if recipe is not None:
+            return recipe
+    generation = _recipe_generation(id)
+    recipe = _cached_recipe(id, generation)
+    if recipe is None:
+        if get_settings().recipe_batching_enabled:
+            recipe = recipe_loader.load(id)
         else:
-            db = db_recipe.database
-        
-        # Try to find the recipe in the current collection first
-        try:
-            recipe = db_recipe.find_one({"_id": ObjectId(id)})
-            if recipe:
-                logger.info(f"Recipe found in collection '{db_recipe.name}' with ID: {id}")
-                return _format_recipe(recipe)
-        except Exception as e:
-            logger.error(f"Error finding recipe in '{db_recipe.name}': {str(e)}")
-        
-        # If not found, try other collections that might contain recipes
-        potential_collections = ['recipes', 'Food']
-        if db_recipe.name not in potential_collections:
-            potential_collections.append(db_recipe.name)
-        
-        # Try each collection
-        for coll_name in potential_collections:
-            if coll_name != db_recipe.name:  # Skip the one we already tried
-                try:
-                    coll = db[coll_name]
-                    recipe = coll.find_one({"_id": ObjectId(id)})
-                    if recipe:
-                        logger.info(f"Recipe found in alternate collection '{coll_name}' with ID: {id}")
-                        return _format_recipe(recipe)
-                except Exception as e:
-                    logger.error(f"Error finding recipe in '{coll_name}': {str(e)}")
-        
-        # If we got here, no recipe was found
-        logger.warning(f"No recipe found with ID: {id} in any collection")
+            recipe = read_flight.do(('recipe', id), _fetchRecipe, id)
+        if recipe is not None and not _shared_unreadable(generation):
+            recipe_cache.set(id, (generation, recipe))
+    return recipe
+
+@timed
+def getRecipesByIds(ids: List[str], projection: Optional[Dict] = None) -> Dict:
+    """Get many recipes by ID with at most one query, in the requested order.
+
+    Full documents are served from the worker cache where possible; projected
+    reads always go to the database since the cache holds whole recipes.
+    """
+    ordered_ids = list(dict.fromkeys(str(ObjectId(id)) for id in ids))
+    found: Dict[str, Any] = {}
+    generations: Dict[str, Optional[int]] = {}
+    if projection is None:
+        for id in ordered_ids:
+            generations[id] = _recipe_generation(id)
+            recipe = _cached_recipe(id, generations[id])
+            if recipe is not None:
+                found[id] = recipe
+
+    to_fetch = [id for id in ordered_ids if id not in found]
+    if to_fetch:
+        fetched = _fetchRecipesByIds(to_fetch, projection)
+        if projection is None:
+            for id, recipe in fetched.items():
+                if not _shared_unreadable(generations[id]):
+                    recipe_cache.set(id, (generations[id], recipe))
+        found.update(fetched)
+
+    return {
+        "recipes": [found[id] for id in ordered_ids if id in found],
+        "missing": [id for id in ordered_ids if id not in found]
+    }
+
+def get_cache_stats() -> Dict[str, Any]:
+    """Return recipe cache and read coalescing statistics for the current worker."""
+    return {
+        "recipe_cache": recipe_cache.stats(),
+        "shared_cache": shared_cache.stats(),
+        "singleflight": read_flight.stats(),
+        "batching": recipe_loader.stats() if get_settings().recipe_batching_enabled else None,
+        "change_watcher": change_watcher.stats() if CHANGE_WATCHER_ENABLED or MIRROR_ENABLED else None,
+        "mirror": recipe_mirror.stats() if MIRROR_ENABLED else None
+    }
+
+@db_connection
+def _fetchRecipe(db_recipe, id: str) -> Optional[Dict]:
+    """Read a single recipe by ID from the database."""
+    try:
+        recipe = _reader(db_recipe).find_one({"_id": ObjectId(id)})
+        if recipe:
+            return recipe
+        logger.warning(f"No recipe found with ID: {id} in '{db_recipe.name}'")
         return None
     except Exception as e:
         logger.error(f"Error retrieving recipe {id}: {str(e)}")
         raise
 
 @db_connection
-def getRecipes(db_recipe) -> List[Dict]:
-    """Get all recipes."""
+def _fetchRecipesByIds(db_recipe, ids: List[str], projection: Optional[Dict] = None) -> Dict[str, Any]:
+    """Read recipes for the given IDs in a single $in query, keyed by ID."""
     try:
-        recipes_cursor = db_recipe.find()
-        recipes_list = list(recipes_cursor)
-        return [_format_recipe(recipe) for recipe in recipes_list]
+        cursor = _reader(db_recipe).find({"_id": {"$in": [ObjectId(id) for id in ids]}}, projection)
+        return {str(recipe["_id"]): recipe for recipe in cursor}
+    except Exception as e:
+        logger.error(f"Error retrieving {len(ids)} recipes by ID: {str(e)}")
+        raise
+
+# Opt-in micro-batching of concurrent getRecipe misses into one $in query
+recipe_loader = BatchLoader(
+    _fetchRecipesByIds,
+    window_ms=get_settings().recipe_batch_window_ms,
+    max_keys=get_settings().recipe_batch_max_keys
+)
+
+@on_reload
+def _apply_settings(old: Settings, new: Settings):
+    """Apply reloaded tuning to the long-lived read components."""
+    change_watcher.poll_interval = new.change_poll_interval_seconds
+    change_watcher.poll_overlap = new.change_poll_overlap_seconds
+    recipe_mirror.max_lag = new.mirror_max_lag_seconds
+    recipe_loader.window = new.recipe_batch_window_ms / 1000.0
+    recipe_loader.max_keys = new.recipe_batch_max_keys
+
+@timed
+def getRecipes(projection: Optional[Dict] = None) -> List[Dict]:
+    """Get all recipes, optionally limited to the projected fields."""
+    if MIRROR_ENABLED and recipe_mirror.fresh():
+        recipes = recipe_mirror.find(projection=projection)
+        if recipes is not None:
+            return recipes
+    return _fetchRecipes(projection)
+
+@coalesced(read_flight, 'getRecipes')
+@db_connection
+def _fetchRecipes(db_recipe, projection: Optional[Dict] = None) -> List[Dict]:
+    """Read all recipes from the database."""
+    try:
+        return list(_reader(db_recipe).find({}, projection))
     except Exception as e:
         logger.error(f"Error retrieving all recipes: {str(e)}")
         raise
 
+@coalesced(read_flight, 'getRecipesPage')
+@db_connection
+def getRecipesPage(db_recipe, limit: int, after: Optional[Tuple[ObjectId, Any]] = None, sort_key: str = '_id',
+                   projection: Optional[Dict] = None) -> Dict:
+    """Get one page of recipes using keyset pagination on the sort key and _id.
+
+    `after` is the (last _id, last sort value) position decoded from a cursor.
+    """
+    try:
+        query = {}
+        if after:
+            query = keyset_filter(sort_key, *after)
+
+        # The sort key must come back so the next cursor can be built
+        projection = ensure_included(projection, sort_key)
+
+        # Fetch one extra document to learn whether another page exists
+        recipes_cursor = _reader(db_recipe).find(query, projection).sort(sort_spec(sort_key)).limit(limit + 1)
+        recipes_list = list(recipes_cursor)
+        has_more = len(recipes_list) > limit
+        recipes_list = recipes_list[:limit]
+
+        next_cursor = encode_cursor(sort_key, recipes_list[-1]) if has_more else None
+        return {
+            "recipes": recipes_list,
+            "limit": limit,
+            "sort": sort_key,
+            "next": next_cursor
+        }
+    except Exception as e:
+        logger.error(f"Error retrieving recipe page: {str(e)}")
+        raise
+
 @db_connection
 def deleteRecipe(db_recipe, id: str) -> Dict:
     """Delete a recipe by ID."""
     try:
         response = db_recipe.delete_one({"_id": ObjectId(id)})
+        invalidate_recipe(id)
         return {"message": "Recipe deleted", "deleted": True} if response.deleted_count else {"message": "Recipe not found", "deleted": False}
     except Exception as e:
         logger.error(f"Error deleting recipe {id}: {str(e)}")
@@ -178,8 +368,11 @@ def updateRecipe(db_recipe, id: str, data: Dict) -> Dict:
         # Remove _id if present to avoid MongoDB error
         if '_id' in update_data:
             update_data.pop('_id')
+        # The write timestamp is maintained here, never taken from the client
+        update_data[UPDATED_AT_FIELD] = datetime.now(timezone.utc)
             
         response = db_recipe.update_one({"_id": ObjectId(id)}, {'$set': update_data})
+        invalidate_recipe(id)
         return {
             "message": "Recipe updated", 
             "updated": True,
@@ -198,31 +391,67 @@ def addRecipe(db_recipe, recipe: Dict) -> str:
     """Add a new recipe."""
     try:
         logger.info("Adding new recipe")
+        recipe = {**recipe, UPDATED_AT_FIELD: datetime.now(timezone.utc)}
         result = db_recipe.insert_one(recipe)
+        invalidate_recipe(str(result.inserted_id))
         logger.info(f"Recipe added with ID: {result.inserted_id}")
         return str(result.inserted_id)
     except Exception as e:
         logger.error(f"Error adding recipe: {str(e)}")
         raise
 
+@timed
+def searchRecipe(search: CompiledQuery, projection: Optional[Dict] = None) -> List[Dict]:
+    """Search for recipes with a query built by query_compiler.compile_search."""
+    # Collation-aware searches follow ICU rules, which only MongoDB applies
+    if MIRROR_ENABLED and search.collation is None and recipe_mirror.fresh():
+        predicate = compile_filter(search.filter)
+        if predicate is not None:
+            recipes = recipe_mirror.find(predicate, projection)
+            if recipes is not None:
+                return recipes
+    return _searchRecipe(search, projection)
+
+@coalesced(read_flight, 'searchRecipe')
 @db_connection
-def searchRecipe(db_recipe, search: Dict) -> List[Dict]:
-    """Search for recipes based on criteria."""
+def _searchRecipe(db_recipe, search: CompiledQuery, projection: Optional[Dict] = None) -> List[Dict]:
+    """Run a compiled search against the database."""
     try:
-        recipes_cursor = db_recipe.find(search)
-        recipes_list = list(recipes_cursor)
-        return [_format_recipe(recipe) for recipe in recipes_list]
+        return list(_reader(db_recipe).find(search.filter, projection, collation=search.collation))
     except Exception as e:
         logger.error(f"Error searching recipes with criteria {search}: {str(e)}")
         raise
 
+@db_connection
+def iterRecipes(db_recipe, search: Optional[CompiledQuery] = None, batch_size: Optional[int] = None,
+                projection: Optional[Dict] = None) -> Iterator[Dict]:
+    """Iterate over matching recipes without materializing the result set.
+
+    The first batch is fetched before returning so that connection and query
+    errors surface here, before a streamed response has started.
+    """
+    try:
+        search = search or CompiledQuery({})
+        # Number of documents pymongo fetches per getMore while streaming
+        batch_size = batch_size or get_settings().stream_batch_size
+        recipes_cursor = _reader(db_recipe).find(search.filter, projection, batch_size=batch_size,
+                                                 collation=search.collation)
+        first = next(recipes_cursor, None)
+        if first is None:
+            recipes_cursor.close()
+            return iter(())
+        return chain([first], recipes_cursor)
+    except Exception as e:
+        logger.error(f"Error streaming recipes with criteria {search}: {str(e)}")
+        raise
+
 @db_connection
 def check_db_consistency(db_recipe):
     """Check and display database and collection information."""
     try:
-        # Get expected configuration from environment variables
-        expected_db_name = os.getenv('MONGO_DATABASE', 'recipeDB')
-        expected_collection_name = os.getenv('RECIPE_COLLECTION_NAME', 'recipes')
+        # Get expected configuration from the collection router
+        expected_db_name = collection_router.db_name
+        expected_collection_name = collection_router.collection_name
         
         # Get current database and collection
         current_db = db_recipe.database
@@ -272,7 +501,8 @@ def check_db_consistency(db_recipe):
             "expected_db": expected_db_name,
             "current_db": current_db_name,
             "expected_collection": expected_collection_name,
-            "current_collection": current_collection_name
+            "current_collection": current_collection_name,
+            "routing": collection_router.describe()
         }
     except Exception as e:
         logger.error(f"Error in database consistency check: {str(e)}")
@@ -281,6 +511,16 @@ def check_db_consistency(db_recipe):
             "error": str(e)
         }
 
+@db_connection
+def ensure_recipe_indexes(db_recipe) -> Dict:
+    """Create missing recipe indexes and report any remaining drift."""
+    return ensure_indexes(db_recipe)
+
+@db_connection
+def check_recipe_indexes(db_recipe) -> Dict:
+    """Report drift between declared and actual recipe indexes."""
+    return index_drift(db_recipe)
+
 @db_connection
 def fix_database_consistency(db_recipe):
     """Fix database consistency by copying recipes between collections."""
@@ -291,9 +531,9 @@ def fix_database_consistency(db_recipe):
         db = db_recipe.database
         client = db.client
         
-        # Get expected names from environment
-        expected_db_name = os.getenv('MONGO_DATABASE', 'recipeDB')
-        expected_collection = os.getenv('RECIPE_COLLECTION_NAME', 'recipes')
+        # Get expected names from the collection router
+        expected_db_name = collection_router.db_name
+        expected_collection = collection_router.collection_name
         
         # Check if we're in the correct database (case-insensitive)
         actual_db_name = db.name
@@ -321,7 +561,7 @@ def fix_database_consistency(db_recipe):
         for coll_name in collections:
             if coll_name.lower() == expected_collection.lower():
                 target_collection = coll_name
-            elif coll_name in ['Food', 'recipes']:
+            elif coll_name in collection_router.fallback_collections:
                 source_collections.append(coll_name)
         
         # If target collection doesn't exist, create it
@@ -377,6 +617,10 @@ def fix_database_consistency(db_recipe):
         
         # Count recipes after sync
         target_count_after = target_coll.count_documents({})
+
+        # The configured collection may now hold the recipes
+        collection_router.reset()
+        invalidate_all()
         
         return {
             "status": "success",
@@ -0,0 +1,284 @@
+import os
+import signal
+import tempfile
+import logging
+import threading
+from dataclasses import dataclass, field, fields, replace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from dotenv import dotenv_values, find_dotenv
+
+logger = logging.getLogger(__name__)
+
+# Variables set by the real process environment take precedence over .env,
+# also when the file is re-read on reload
+_PROCESS_ENV = frozenset(os.environ)
+
+_TRUE = ('1', 'true', 'yes', 'on')
+_FALSE = ('0', 'false', 'no', 'off')
+
+class SettingsError(ValueError):
+    """Raised when the configuration contains invalid values."""
+    pass
+
+def _setting(env: str, default: Any, reloadable: bool = False, minimum: Optional[float] = None,
+             maximum: Optional[float] = None, choices: Optional[Tuple[str, ...]] = None):
+    """Declare a setting read from an environment variable."""
+    return field(default=default, metadata={
+        "env": env, "reloadable": reloadable, "min": minimum, "max": maximum, "choices": choices
+    })
+
+def _shared_memory_path(name: str) -> str:
+    # /dev/shm is a tmpfs, so files there live in shared memory on Linux
+    directory = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(directory, name)
+
+@dataclass(frozen=True)
+class Settings:
+    """Application configuration, parsed and validated once from the environment.
+
+    Settings marked reloadable take effect on RELOAD_SIGNAL; the others are
+    bound when the process starts and need a restart.
+    """
+
+    # Logging
+    log_level: str = _setting('LOG_LEVEL', 'info', reloadable=True,
+                              choices=('debug', 'info', 'warning', 'error', 'critical'))
+    log_file_path: str = _setting('LOG_FILE_PATH', 'logs/app.log')
+    log_format: str = _setting('LOG_FORMAT', '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    log_json: bool = _setting('LOG_JSON', False, reloadable=True)
+    log_rotation: str = _setting('LOG_ROTATION', 'size', choices=('none', 'size', 'time'))
+    log_max_bytes: int = _setting('LOG_MAX_BYTES', 10 * 1024 * 1024, minimum=1024)
+    log_backup_count: int = _setting('LOG_BACKUP_COUNT', 5, minimum=0)
+    log_rotate_when: str = _setting('LOG_ROTATE_WHEN', 'midnight',
+                                    choices=('s', 'm', 'h', 'd', 'midnight') + tuple(f'w{day}' for day in range(7)))
+    log_queue_size: int = _setting('LOG_QUEUE_SIZE', 10000, minimum=1)
+    log_sample_rates: str = _setting('LOG_SAMPLE_RATES', '', reloadable=True)
+
+    # Server
+    host: str = _setting('HOST', '0.0.0.0')
+    port: int = _setting('PORT', 6088, minimum=1, maximum=65535)
+    workers: int = _setting('WORKERS', 3, minimum=1)
+    flask_env: str = _setting('FLASK_ENV', 'production')
+    prefork_warmup: bool = _setting('PREFORK_WARMUP', True)
+    prefork_snapshot: bool = _setting('PREFORK_SNAPSHOT', True)
+    ensure_indexes_on_startup: bool = _setting('ENSURE_INDEXES_ON_STARTUP', True)
+    cors_allowed_origins: str = _setting('CORS_ALLOWED_ORIGINS', '*')
+
+    # Database connection
+    mongodb_uri: Optional[str] = _setting('MONGODB_URI', None)
+    db_host: str = _setting('DB_HOST', 'localhost')
+    db_port: int = _setting('DB_PORT', 27017, minimum=1, maximum=65535)
+    db_user: str = _setting('DB_USER', 'root')
+    db_pass: str = _setting('DB_PASS', 'root')
+    db_timeout_ms: int = _setting('DB_TIMEOUT_MS', 5000, minimum=1)
+    db_max_pool_size: int = _setting('DB_MAX_POOL_SIZE', 50, minimum=1)
+    db_min_pool_size: int = _setting('DB_MIN_POOL_SIZE', 0, minimum=0)
+    db_max_idle_time_ms: int = _setting('DB_MAX_IDLE_TIME_MS', 300000, minimum=0)
+    db_wait_queue_timeout_ms: int = _setting('DB_WAIT_QUEUE_TIMEOUT_MS', 5000, minimum=0)
+    db_heartbeat_frequency_ms: int = _setting('DB_HEARTBEAT_FREQUENCY_MS', 10000, minimum=500)
+    db_fail_fast: bool = _setting('DB_FAIL_FAST', True, reloadable=True)
+    query_monitor_enabled: bool = _setting('QUERY_MONITOR_ENABLED', True)
+    slow_query_ms: float = _setting('SLOW_QUERY_MS', 100.0, reloadable=True, minimum=0)
+    query_explain_enabled: bool = _setting('QUERY_EXPLAIN_ENABLED', False, reloadable=True)
+
+    # Database layout
+    recipe_db_name: Optional[str] = _setting('RECIPE_DB_NAME', None)
+    mongo_database: str = _setting('MONGO_DATABASE', 'RecipeDB')
+    recipe_collection_name: str = _setting('RECIPE_COLLECTION_NAME', 'Food')
+    recipe_fallback_collections: Tuple[str, ...] = _setting('RECIPE_FALLBACK_COLLECTIONS', ('Food', 'recipes'))
+    index_collation_locale: str = _setting('INDEX_COLLATION_LOCALE', 'nb')
+    # Memory only: results stay raw BSON until encoded, which costs more CPU
+    lazy_bson_decode: bool = _setting('LAZY_BSON_DECODE', False, reloadable=True)
+
+    # Worker cache, read coalescing and batching
+    recipe_cache_enabled: bool = _setting('RECIPE_CACHE_ENABLED', True, reloadable=True)
+    recipe_cache_size: int = _setting('RECIPE_CACHE_SIZE', 512, reloadable=True, minimum=1)
+    recipe_cache_ttl_seconds: float = _setting('RECIPE_CACHE_TTL_SECONDS', 300.0, reloadable=True, minimum=0)
+    recipe_batching_enabled: bool = _setting('RECIPE_BATCHING_ENABLED', False, reloadable=True)
+    recipe_batch_window_ms: float = _setting('RECIPE_BATCH_WINDOW_MS', 2.0, reloadable=True, minimum=0)
+    recipe_batch_max_keys: int = _setting('RECIPE_BATCH_MAX_KEYS', 50, reloadable=True, minimum=1)
+
+    # Shared cache, change watcher and mirror
+    shared_cache_enabled: bool = _setting('SHARED_CACHE_ENABLED', False)
+    shared_cache_path: Optional[str] = _setting('SHARED_CACHE_PATH', None)
+    shared_cache_max_bytes: int = _setting('SHARED_CACHE_MAX_BYTES', 32 * 1024 * 1024, minimum=1024)
+    change_watcher_enabled: bool = _setting('CHANGE_WATCHER_ENABLED', False)
+    change_watcher_mode: str = _setting('CHANGE_WATCHER_MODE', 'auto', choices=('auto', 'change_stream', 'poll'))
+    change_poll_interval_seconds: float = _setting('CHANGE_POLL_INTERVAL_SECONDS', 2.0, reloadable=True, minimum=0.05)
+    change_poll_overlap_seconds: float = _setting('CHANGE_POLL_OVERLAP_SECONDS', 5.0, reloadable=True, minimum=0)
+    mirror_enabled: bool = _setting('MIRROR_ENABLED', False)
+    mirror_max_lag_seconds: float = _setting('MIRROR_MAX_LAG_SECONDS', 10.0, reloadable=True, minimum=0)
+    mirror_compact: bool = _setting('MIRROR_COMPACT', True)
+
+    # API
+    recipes_default_page_size: int = _setting('RECIPES_DEFAULT_PAGE_SIZE', 12, reloadable=True, minimum=1)
+    recipes_max_page_size: int = _setting('RECIPES_MAX_PAGE_SIZE', 100, reloadable=True, minimum=1)
+    recipes_batch_max: int = _setting('RECIPES_BATCH_MAX', 100, reloadable=True, minimum=1)
+    stream_batch_size: int = _setting('STREAM_BATCH_SIZE', 100, reloadable=True, minimum=1)
+    stream_chunk_bytes: int = _setting('STREAM_CHUNK_BYTES', 32768, reloadable=True, minimum=1)
+
+    # Metrics
+    metrics_enabled: bool = _setting('METRICS_ENABLED', True)
+    prometheus_multiproc_dir: Optional[str] = _setting('PROMETHEUS_MULTIPROC_DIR', None)
+
+    # Compression
+    compression_enabled: bool = _setting('COMPRESSION_ENABLED', True, reloadable=True)
+    compression_min_size: int = _setting('COMPRESSION_MIN_SIZE', 1024, reloadable=True, minimum=0)
+    compression_gzip_level: int = _setting('COMPRESSION_GZIP_LEVEL', 6, reloadable=True, minimum=1, maximum=9)
+    compression_brotli_quality: int = _setting('COMPRESSION_BROTLI_QUALITY', 5, reloadable=True, minimum=0, maximum=11)
+    compression_zstd_level: int = _setting('COMPRESSION_ZSTD_LEVEL', 3, reloadable=True, minimum=1, maximum=22)
+    compression_cache_size: int = _setting('COMPRESSION_CACHE_SIZE', 64, reloadable=True, minimum=1)
+    compression_cache_ttl_seconds: float = _setting('COMPRESSION_CACHE_TTL_SECONDS', 3600.0, reloadable=True, minimum=0)
+
+    @property
+    def database_name(self) -> str:
+        return self.recipe_db_name or self.mongo_database
+
+    @property
+    def sample_rates(self) -> Dict[str, float]:
+        return parse_sample_rates(self.log_sample_rates)
+
+    @property
+    def shared_cache_file(self) -> str:
+        return self.shared_cache_path or _shared_memory_path('recipebook-cache.sqlite')
+
+    @property
+    def metrics_dir(self) -> str:
+        return self.prometheus_multiproc_dir or _shared_memory_path('recipebook-metrics')
+
+    @property
+    def development(self) -> bool:
+        return self.flask_env == 'development'
+
+def parse_sample_rates(value: str) -> Dict[str, float]:
+    """Parse 'logger=rate,...' into a map of logger name to the share of info/debug lines kept."""
+    rates = {}
+    for part in value.split(','):
+        if not part.strip():
+            continue
+        name, _, rate = part.partition('=')
+        try:
+            rates[name.strip()] = float(rate)
+        except ValueError:
+            raise SettingsError(f"LOG_SAMPLE_RATES entries must look like 'logger=0.1', got '{part.strip()}'") from None
+        if not name.strip() or not 0 <= rates[name.strip()] <= 1:
+            raise SettingsError(f"LOG_SAMPLE_RATES rates must be between 0 and 1, got '{part.strip()}'")
+    return rates
+
+def _parse(name: str, kind: Any, raw: str) -> Any:
+    value = raw.strip()
+    if kind is bool:
+        if value.lower() in _TRUE:
+            return True
+        if value.lower() in _FALSE:
+            return False
+        raise SettingsError(f"{name} must be true or false, got '{raw}'")
+    if kind is int:
+        try:
+            return int(value)
+        except ValueError:
+            raise SettingsError(f"{name} must be an integer, got '{raw}'") from None
+    if kind is float:
+        try:
+            return float(value)
+        except ValueError:
+            raise SettingsError(f"{name} must be a number, got '{raw}'") from None
+    if kind == Tuple[str, ...]:
+        return tuple(part.strip() for part in value.split(',') if part.strip())
+    return value
+
+def _load_env_file():
+    """Apply .env to os.environ without overriding the real environment."""
+    for key, value in dotenv_values(find_dotenv()).items():
+        if key not in _PROCESS_ENV and value is not None:
+            os.environ[key] = value
+
+def load_settings() -> Settings:
+    """Read .env and the environment into a validated Settings object."""
+    _load_env_file()
+    values: Dict[str, Any] = {}
+    errors: List[str] = []
+    for spec in fields(Settings):
+        meta = spec.metadata
+        raw = os.environ.get(meta["env"])
+        if raw is None or not raw.strip():
+            continue
+        kind = {Optional[str]: str}.get(spec.type, spec.type)
+        try:
+            value = _parse(meta["env"], kind, raw)
+            if meta["choices"] and value.lower() not in meta["choices"]:
+                raise SettingsError(f"{meta['env']} must be one of {', '.join(meta['choices'])}, got '{raw}'")
+            if meta["min"] is not None and value < meta["min"]:
+                raise SettingsError(f"{meta['env']} must be at least {meta['min']}, got {value}")
+            if meta["max"] is not None and value > meta["max"]:
+                raise SettingsError(f"{meta['env']} must be at most {meta['max']}, got {value}")
+            values[spec.name] = value.lower() if meta["choices"] else value
+        except SettingsError as e:
+            errors.append(str(e))
+
+    settings = Settings(**values)
+    if settings.recipes_default_page_size > settings.recipes_max_page_size:
+        errors.append("RECIPES_DEFAULT_PAGE_SIZE must not exceed RECIPES_MAX_PAGE_SIZE")
+    if settings.db_min_pool_size > settings.db_max_pool_size:
+        errors.append("DB_MIN_POOL_SIZE must not exceed DB_MAX_POOL_SIZE")
+    try:
+        settings.sample_rates
+    except SettingsError as e:
+        errors.append(str(e))
+    if errors:
+        raise SettingsError("Invalid configuration: " + "; ".join(errors))
+    return settings
+
+_settings = load_settings()
+_listeners: List[Callable[[Settings, Settings], None]] = []
+_reload_lock = threading.Lock()
+
+def get_settings() -> Settings:
+    """Return the current settings; cheap enough to call on every request."""
+    return _settings
+
+def on_reload(listener: Callable[[Settings, Settings], None]):
+    """Register a callback run with (old, new) settings after each reload."""
+    _listeners.append(listener)
+    return listener
+
+def reload_settings() -> Settings:
+    """Re-read the configuration and apply the reloadable parts.
+
+    Invalid configuration is rejected and the current settings stay active.
+    Settings that need a restart keep their current values, so they always
+    agree with what the modules bound at import.
+    """
+    global _settings
+    with _reload_lock:
+        old = _settings
+        try:
+            new = load_settings()
+        except SettingsError as e:
+            logger.error(f"Settings reload rejected: {str(e)}")
+            return old
+
+        changed = [spec for spec in fields(Settings) if getattr(old, spec.name) != getattr(new, spec.name)]
+        pending = [spec for spec in changed if not spec.metadata["reloadable"]]
+        if pending:
+            logger.warning("Settings that need a restart to take effect changed: "
+                           f"{', '.join(spec.metadata['env'] for spec in pending)}")
+            new = replace(new, **{spec.name: getattr(old, spec.name) for spec in pending})
+            changed = [spec for spec in changed if spec.metadata["reloadable"]]
+        _settings = new
+        for listener in _listeners:
+            try:
+                listener(old, new)
+            except Exception as e:
+                logger.error(f"Settings reload listener {listener.__name__} failed: {str(e)}")
+        logger.info(f"Settings reloaded, {len(changed)} changed: {', '.join(spec.metadata['env'] for spec in changed)}")
+        return new
+
+# Reloads the settings in place. Not SIGHUP: Gunicorn's master answers that
+# by replacing every worker, which throws away their caches
+RELOAD_SIGNAL = getattr(signal, 'SIGUSR2', None)
+
+def install_reload_signal():
+    """Reload the settings in this process when it receives RELOAD_SIGNAL."""
+    if RELOAD_SIGNAL is not None:
+        signal.signal(RELOAD_SIGNAL, lambda signum, frame: reload_settings())
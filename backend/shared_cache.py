@@ -0,0 +1,386 @@
+import os
+import sqlite3
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Namespace holding every list payload (full lists and pages)
+LIST_NAMESPACE = 'recipes'
+# Bumped when the recipes may have moved to another collection
+ROUTING_NAMESPACE = 'routing'
+# Bumping this namespace invalidates every entry in every namespace
+GLOBAL_NAMESPACE = '*'
+
+def recipe_namespace(id: str) -> str:
+    """Namespace of the entries that depend on a single recipe."""
+    return f"recipe:{str(id).lower()}"
+
+# Bumped whenever the tables change; an older database is rebuilt, which
+# only costs the cached payloads
+SCHEMA_VERSION = 4
+_TABLES = ('generations', 'entries', 'meta', 'changes')
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS generations (
+        namespace TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS entries (
+        key TEXT PRIMARY KEY,
+        namespace TEXT NOT NULL,
+        generation INTEGER NOT NULL,
+        etag TEXT,
+        value BLOB NOT NULL,
+        size INTEGER NOT NULL,
+        last_access REAL NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)",
+    """CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    )""",
+    # Recipe changes seen by the node's change watcher; a NULL id means everything changed
+    """CREATE TABLE IF NOT EXISTS changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        recipe_id TEXT
+    )""",
+)
+# Meta row holding the total payload size, kept current by every write
+_BYTES_KEY = 'entries_bytes'
+
+def _is_busy(error: sqlite3.Error) -> bool:
+    """Whether an error only means another process held the write lock."""
+    return isinstance(error, sqlite3.OperationalError) and ('locked' in str(error) or 'busy' in str(error))
+
+class SharedCache:
+    """Serialized payload cache shared by every worker process on a node.
+
+    Entries live in a SQLite database (on tmpfs where available) and belong to
+    a namespace with a generation counter. Writes bump the generation, which
+    makes every entry stored under an older generation a miss in all workers
+    at once. Total payload size is bounded with LRU eviction.
+
+    A read does not write: each process collects the access times of its hits
+    and writes them in one batch every TOUCH_INTERVAL or TOUCH_BATCH hits.
+    Cache operations give up after BUSY_TIMEOUT rather than stall the gevent
+    hub behind another worker's write: a locked read is a miss and a locked
+    store is skipped. Invalidations are retried instead, sleeping
+    cooperatively, since dropping one would serve stale data.
+    """
+
+    BUSY_TIMEOUT = 0.05
+    # How long an invalidation keeps retrying a locked database before failing
+    WRITE_RETRY_SECONDS = 5.0
+    # Entries removed per eviction query
+    EVICT_BATCH = 32
+    # Access times are written at most this often, or after this many hits
+    TOUCH_INTERVAL = 1.0
+    TOUCH_BATCH = 100
+    # Changes kept in the log; a process further behind than this starts over
+    CHANGE_LOG_SIZE = 10000
+    CHANGE_BATCH = 1000
+
+    def __init__(self, path: str, max_bytes: int, enabled: bool = True):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        # Access times of this process's hits not written yet, by key
+        self._touched: Dict[str, float] = {}
+        self._touched_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.busy = 0
+        self.evictions = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        """Open one connection per process; connections must not cross fork."""
+        if self._conn is None or self._pid != os.getpid():
+            # Setup runs once per process and may wait for a concurrent one
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._create_schema(conn)
+            conn.execute(f"PRAGMA busy_timeout = {int(self.BUSY_TIMEOUT * 1000)}")
+            self._conn = conn
+            self._pid = os.getpid()
+            self._touched = {}
+        return self._conn
+
+    def _create_schema(self, conn: sqlite3.Connection):
+        if conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION:
+            return
+        with self._transaction(conn):
+            if conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION:
+                return
+            for table in _TABLES:
+                conn.execute(f"DROP TABLE IF EXISTS {table}")
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            conn.execute("INSERT INTO meta (key, value) VALUES (?, 0)", (_BYTES_KEY,))
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    @contextmanager
+    def _transaction(self, conn: sqlite3.Connection, mode: str = 'IMMEDIATE'):
+        conn.execute(f"BEGIN {mode}")
+        try:
+            yield
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _write(self, operation: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Run a write that must not be lost, retrying while the database is locked."""
+        deadline = time.monotonic() + self.WRITE_RETRY_SECONDS
+        delay = 0.005
+        while True:
+            try:
+                with self._lock:
+                    conn = self._connection()
+                    with self._transaction(conn):
+                        return operation(conn)
+            except sqlite3.Error as e:
+                if not _is_busy(e) or time.monotonic() > deadline:
+                    raise
+            # Outside the lock; time.sleep yields to other greenlets under gevent
+            time.sleep(delay)
+            delay = min(delay * 2, 0.1)
+
+    def generation(self, namespace: str) -> Optional[int]:
+        """Return the current generation of a namespace, including global bumps.
+
+        Returns None when the database could not be read; callers then bypass
+        the shared tier for the request instead of failing it.
+        """
+        try:
+            with self._lock:
+                row = self._connection().execute(
+                    "SELECT COALESCE(SUM(value), 0) FROM generations WHERE namespace IN (?, ?)",
+                    (namespace, GLOBAL_NAMESPACE)).fetchone()
+        except sqlite3.Error as e:
+            self._read_failed(f"generation of {namespace}", e)
+            return None
+        return row[0]
+
+    def _read_failed(self, what: str, error: sqlite3.Error):
+        if _is_busy(error):
+            self.busy += 1
+        else:
+            logger.warning(f"Shared cache read failed for {what}: {str(error)}")
+
+    def bump(self, *namespaces: str):
+        """Invalidate every entry in the given namespaces, in all workers."""
+        self._write(lambda conn: self._bump(conn, namespaces))
+
+    def _bump(self, conn: sqlite3.Connection, namespaces: Iterable[str]):
+        conn.executemany(
+            "INSERT INTO generations (namespace, value) VALUES (?, 1) "
+            "ON CONFLICT(namespace) DO UPDATE SET value = value + 1",
+            [(namespace,) for namespace in namespaces])
+
+    def clear(self):
+        """Invalidate every entry in all workers and drop the stored payloads."""
+        self._write(self._clear)
+
+    def _clear(self, conn: sqlite3.Connection):
+        self._bump(conn, (GLOBAL_NAMESPACE,))
+        conn.execute("DELETE FROM entries")
+        conn.execute("UPDATE meta SET value = 0 WHERE key = ?", (_BYTES_KEY,))
+
+    def get_meta(self, key: str, strict: bool = False) -> Optional[str]:
+        """Read node-wide state that must outlive worker restarts.
+
+        A failed read returns None like a missing key, unless `strict` is set,
+        for callers that must not mistake an error for an absent value.
+        """
+        try:
+            with self._lock:
+                row = self._connection().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            if strict:
+                raise
+            self._read_failed(key, e)
+            return None
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: Optional[str]):
+        def store(conn: sqlite3.Connection):
+            if value is None:
+                conn.execute("DELETE FROM meta WHERE key = ?", (key,))
+            else:
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+        self._write(store)
+
+    def publish_change(self, id: Optional[str]):
+        """Invalidate a changed recipe in all workers and log it for their own copies.
+
+        Pass None when everything may have changed. Processes read the log
+        with changes_since() to update what they hold in memory.
+        """
+        def publish(conn: sqlite3.Connection):
+            if id is None:
+                self._clear(conn)
+            else:
+                self._bump(conn, (recipe_namespace(id), LIST_NAMESPACE))
+            seq = conn.execute("INSERT INTO changes (recipe_id) VALUES (?)", (id,)).lastrowid
+            conn.execute("DELETE FROM changes WHERE seq <= ?", (seq - self.CHANGE_LOG_SIZE,))
+        self._write(publish)
+
+    def change_position(self) -> int:
+        """Sequence number of the latest logged change."""
+        with self._lock:
+            return self._change_position(self._connection())
+
+    def _change_position(self, conn: sqlite3.Connection) -> int:
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'changes'").fetchone()
+        return row[0] if row else 0
+
+    def changes_since(self, position: int) -> Optional[List[Tuple[int, Optional[str]]]]:
+        """Return up to CHANGE_BATCH logged (seq, recipe_id) pairs after a position.
+
+        Returns None when changes after the position are no longer in the log,
+        so the caller has to assume everything changed.
+        """
+        with self._lock:
+            conn = self._connection()
+            with self._transaction(conn, 'DEFERRED'):
+                last = self._change_position(conn)
+                first = conn.execute("SELECT MIN(seq) FROM changes").fetchone()[0]
+                if position > last or (position < last and (first is None or position < first - 1)):
+                    return None
+                return conn.execute("SELECT seq, recipe_id FROM changes WHERE seq > ? ORDER BY seq LIMIT ?",
+                                    (position, self.CHANGE_BATCH)).fetchall()
+
+    def get(self, key: str) -> Optional[Tuple[bytes, Optional[str]]]:
+        """Return (payload, etag) if the entry exists and is still current."""
+        try:
+            return self._get(key)
+        except sqlite3.Error as e:
+            self._read_failed(key, e)
+            self.misses += 1
+            return None
+
+    def _get(self, key: str) -> Optional[Tuple[bytes, Optional[str]]]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT e.value, e.etag, e.generation, "
+                "(SELECT COALESCE(SUM(g.value), 0) FROM generations g WHERE g.namespace IN (e.namespace, ?)) "
+                "FROM entries e WHERE e.key = ?", (GLOBAL_NAMESPACE, key)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        value, etag, generation, current = row
+        if generation != current:
+            # Left in place: the next store replaces it, or eviction removes it
+            self.stale += 1
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._touch(key)
+        return bytes(value), etag
+
+    def _touch(self, key: str):
+        now = time.time()
+        self._touched[key] = now
+        if len(self._touched) < self.TOUCH_BATCH and now - self._touched_at < self.TOUCH_INTERVAL:
+            return
+        self._touched_at = now
+        try:
+            with self._lock:
+                conn = self._connection()
+                with self._transaction(conn):
+                    self._write_touches(conn)
+                self._touched = {}
+        except sqlite3.Error as e:
+            # Kept for the next batch; access times only steer eviction
+            if _is_busy(e):
+                self.busy += 1
+            else:
+                logger.warning(f"Shared cache access time update failed: {str(e)}")
+            if len(self._touched) > self.TOUCH_BATCH * 10:
+                self._touched = {}
+
+    def _write_touches(self, conn: sqlite3.Connection):
+        conn.executemany("UPDATE entries SET last_access = ? WHERE key = ?",
+                         [(at, key) for key, at in self._touched.items()])
+
+    def set(self, key: str, namespace: str, generation: int, value: bytes, etag: Optional[str] = None):
+        """Store a payload read under the given namespace generation.
+
+        Pass the generation observed before reading the data, so a write that
+        lands during the read leaves the stored entry already stale.
+        """
+        if len(value) > self.max_bytes:
+            return
+        try:
+            with self._lock:
+                conn = self._connection()
+                with self._transaction(conn):
+                    # Pending access times first, so eviction sees what was read
+                    self._write_touches(conn)
+                    row = conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+                    conn.execute(
+                        "INSERT OR REPLACE INTO entries (key, namespace, generation, etag, value, size, last_access) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (key, namespace, generation, etag, value, len(value), time.time()))
+                    total = self._add_bytes(conn, len(value) - (row[0] if row else 0))
+                    if total > self.max_bytes:
+                        self._evict(conn, total)
+                self._touched = {}
+        except sqlite3.Error as e:
+            if _is_busy(e):
+                self.busy += 1
+            else:
+                logger.warning(f"Shared cache write failed for {key}: {str(e)}")
+
+    def _add_bytes(self, conn: sqlite3.Connection, delta: int) -> int:
+        conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + ? WHERE key = ?", (delta, _BYTES_KEY))
+        return int(conn.execute("SELECT value FROM meta WHERE key = ?", (_BYTES_KEY,)).fetchone()[0])
+
+    def _evict(self, conn: sqlite3.Connection, total: int):
+        freed = 0
+        while total - freed > self.max_bytes:
+            rows = conn.execute("SELECT key, size FROM entries ORDER BY last_access LIMIT ?",
+                                (self.EVICT_BATCH,)).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if total - freed <= self.max_bytes:
+                    break
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                freed += size
+                self.evictions += 1
+        self._add_bytes(conn, -freed)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {
+            "enabled": self.enabled,
+            "path": self.path,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "busy": self.busy,
+            "evictions": self.evictions
+        }
+        if self.enabled:
+            with self._lock:
+                conn = self._connection()
+                count = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+                size = conn.execute("SELECT value FROM meta WHERE key = ?", (_BYTES_KEY,)).fetchone()[0]
+            stats.update({"entries": count, "bytes": int(size)})
+        return stats
+
+shared_cache = SharedCache(
+    path=get_settings().shared_cache_file,
+    max_bytes=get_settings().shared_cache_max_bytes,
+    enabled=get_settings().shared_cache_enabled
+)
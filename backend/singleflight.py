@@ -0,0 +1,78 @@
+import json
+import threading
+from functools import wraps
+from typing import Any, Callable, Dict, Hashable
+
+class _Call:
+    """An in-flight call whose result is shared by every waiter."""
+
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Collapse identical concurrent calls into one execution.
+
+    The first caller for a key runs the function; callers arriving while it is
+    still running wait for it and receive the same result (or exception).
+    Shared results must be treated as read-only.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.executions = 0
+        self.collapsed = 0
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.collapsed += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "executions": self.executions,
+                "collapsed": self.collapsed,
+                "in_flight": len(self._calls)
+            }
+
+def flight_key(*parts: Any) -> str:
+    """Build a stable key from call arguments such as queries and projections."""
+    return json.dumps(parts, sort_keys=True, default=str, separators=(',', ':'))
+
+def coalesced(flight: SingleFlight, name: str):
+    """Decorator routing calls with identical arguments through a SingleFlight."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            return flight.do(flight_key(name, args, kwargs), func, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,55 @@
+from typing import Iterable, Iterator, Dict
+from json_provider import dumps_bytes
+from settings import get_settings
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+def wants_stream(request) -> bool:
+    """Check whether the client asked for a streamed response."""
+    if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return True
+    return wants_ndjson(request)
+
+def wants_ndjson(request) -> bool:
+    """Check whether the client prefers newline-delimited JSON."""
+    best = request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE])
+    return best == NDJSON_MIMETYPE
+
+def stream_json_array(documents: Iterable[Dict]) -> Iterator[bytes]:
+    """Yield a JSON array chunk by chunk without holding every document."""
+    # Encoded documents are buffered up to roughly this many bytes per chunk
+    chunk_bytes = get_settings().stream_chunk_bytes
+    buffer = [b'[']
+    size = 1
+    first = True
+    for document in documents:
+        encoded = dumps_bytes(document)
+        if not first:
+            buffer.append(b',')
+            size += 1
+        buffer.append(encoded)
+        size += len(encoded)
+        first = False
+        if size >= chunk_bytes:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+    buffer.append(b']')
+    yield b''.join(buffer)
+
+def stream_ndjson(documents: Iterable[Dict]) -> Iterator[bytes]:
+    """Yield one JSON document per line, batched into chunks."""
+    chunk_bytes = get_settings().stream_chunk_bytes
+    buffer = []
+    size = 0
+    for document in documents:
+        encoded = dumps_bytes(document)
+        buffer.append(encoded)
+        buffer.append(b'\n')
+        size += len(encoded) + 1
+        if size >= chunk_bytes:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b''.join(buffer)